@@ -0,0 +1,182 @@
+# -*- coding: utf-8 -*-
+import os
+import re
+import sqlite3
+import threading
+from contextlib import contextmanager
+from urllib.request import pathname2url
+
+# 每个连接建立后执行的 PRAGMA（config.json 的 storage_profile 可覆盖）
+DEFAULT_PRAGMAS = {
+    "busy_timeout": 5000,
+    "temp_store": "MEMORY",
+}
+
+# storage_profile 中允许设置的 PRAGMA
+SUPPORTED_PRAGMAS = {
+    "journal_mode", "synchronous", "cache_size", "mmap_size", "temp_store",
+    "busy_timeout", "wal_autocheckpoint", "journal_size_limit",
+}
+
+# 只对写连接生效的 PRAGMA（只读连接上设置会失败）
+WRITER_PRAGMAS = {"journal_mode", "wal_autocheckpoint", "journal_size_limit"}
+
+_PRAGMA_VALUE = re.compile(r"^-?[A-Za-z0-9_]+$")
+
+
+def build_pragmas(profile):
+    """从 storage_profile 中筛选合法的 PRAGMA 设置"""
+    pragmas = dict(DEFAULT_PRAGMAS)
+    for name, value in (profile or {}).items():
+        if name in SUPPORTED_PRAGMAS and _PRAGMA_VALUE.match(str(value)):
+            pragmas[name] = value
+    return pragmas
+
+
+class ConnectionPool:
+    """SQLite 连接池：每个线程持有一个长连接，避免反复 connect/close"""
+
+    _pools = {}
+    _pools_lock = threading.Lock()
+
+    def __init__(self, db_path, profile=None, timeout=30.0, cached_statements=256):
+        self.db_path = db_path
+        profile = profile or {}
+        self.pragmas = build_pragmas(profile)
+        # 单次批量写入超过该行数后主动 checkpoint，防止 WAL 文件无限增长
+        self.checkpoint_after_rows = int(profile.get("checkpoint_after_rows", 20000))
+        self.timeout = timeout
+        self.cached_statements = cached_statements
+        self._local = threading.local()
+        self._read_local = threading.local()
+        self._lock = threading.Lock()
+        self._connections = {}
+        # close_all 后递增，使各线程缓存的旧连接失效
+        self._generation = 0
+
+    @classmethod
+    def for_path(cls, db_path, profile=None):
+        """按数据库路径获取共享连接池（多个 DatabaseManager 共用，首次创建时的配置生效）"""
+        key = os.path.abspath(db_path)
+        with cls._pools_lock:
+            pool = cls._pools.get(key)
+            if pool is None:
+                pool = cls(db_path, profile)
+                cls._pools[key] = pool
+            return pool
+
+    @classmethod
+    def close_all_pools(cls):
+        """关闭所有连接池（程序退出时调用）"""
+        with cls._pools_lock:
+            pools = list(cls._pools.values())
+        for pool in pools:
+            pool.close_all()
+
+    def _connect(self, read_only=False):
+        # check_same_thread=False 仅为了允许在退出时由主线程统一关闭，
+        # 连接本身始终只在创建它的线程中使用
+        if read_only:
+            target = "file:" + pathname2url(os.path.abspath(self.db_path)) + "?mode=ro"
+        else:
+            target = self.db_path
+        conn = sqlite3.connect(
+            target,
+            timeout=self.timeout,
+            cached_statements=self.cached_statements,
+            check_same_thread=False,
+            uri=read_only,
+        )
+        conn.row_factory = sqlite3.Row  # 允许通过列名访问
+        for name, value in self.pragmas.items():
+            if read_only and name in WRITER_PRAGMAS:
+                continue
+            conn.execute(f"PRAGMA {name} = {value}")
+        if read_only:
+            conn.execute("PRAGMA query_only = ON")
+        return conn
+
+    def _acquire(self, local, read_only):
+        conn = getattr(local, "conn", None)
+        if conn is None or local.generation != self._generation:
+            conn = self._connect(read_only)
+            local.conn = conn
+            local.generation = self._generation
+            local.depth = 0
+            with self._lock:
+                self._connections[(threading.get_ident(), read_only)] = conn
+        return conn
+
+    def acquire(self):
+        """获取当前线程的读写连接（不存在时创建）"""
+        return self._acquire(self._local, read_only=False)
+
+    def acquire_reader(self):
+        """获取当前线程的只读连接；WAL 模式下读操作不会与写操作互相阻塞"""
+        return self._acquire(self._read_local, read_only=True)
+
+    @contextmanager
+    def connection(self):
+        """
+        借用当前线程连接的上下文管理器
+
+        可嵌套使用，只有最外层退出时才提交；发生异常时回滚。
+        """
+        conn = self.acquire()
+        self._local.depth += 1
+        try:
+            yield conn
+        except BaseException:
+            self._local.depth -= 1
+            if self._local.depth == 0 and conn.in_transaction:
+                conn.rollback()
+            raise
+        else:
+            self._local.depth -= 1
+            if self._local.depth == 0 and conn.in_transaction:
+                conn.commit()
+
+    @contextmanager
+    def read_connection(self):
+        """借用当前线程只读连接的上下文管理器（用于看板、报表等查询）"""
+        yield self.acquire_reader()
+
+    @contextmanager
+    def transaction(self):
+        """显式写事务（BEGIN IMMEDIATE），用于批量写入"""
+        with self.connection() as conn:
+            if not conn.in_transaction:
+                conn.execute("BEGIN IMMEDIATE")
+            yield conn
+
+    def checkpoint(self, mode="PASSIVE"):
+        """执行 WAL checkpoint；TRUNCATE 会把 WAL 文件截断为 0"""
+        if mode not in ("PASSIVE", "FULL", "RESTART", "TRUNCATE"):
+            raise ValueError(f"不支持的 checkpoint 模式: {mode}")
+        with self.connection() as conn:
+            return tuple(conn.execute(f"PRAGMA wal_checkpoint({mode})").fetchone())
+
+    def release_thread(self):
+        """关闭当前线程的连接（工作线程结束前调用）"""
+        for local, read_only in ((self._local, False), (self._read_local, True)):
+            conn = getattr(local, "conn", None)
+            if conn is None:
+                continue
+            local.conn = None
+            with self._lock:
+                self._connections.pop((threading.get_ident(), read_only), None)
+            conn.close()
+
+    def close_all(self):
+        """关闭所有线程的连接"""
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+            self._generation += 1
+        for conn in connections:
+            try:
+                if conn.in_transaction:
+                    conn.rollback()
+                conn.close()
+            except sqlite3.Error:
+                pass
@@ -1,25 +1,263 @@
 # -*- coding: utf-8 -*-
+import hashlib
+import json
 import sqlite3
 import os
-from datetime import datetime
+import re
+from datetime import datetime, date, timedelta
+from itertools import islice
+from db.connection import ConnectionPool
+from db.issues import classify_issue_flags, product_issue
+from db.snapshots import encode_blob, store_blob, decode_blob, blob_hash, diff_fields
+from utils.backup import BackupManager
+
+# insert_tech_status 写入的技术状态字段（不含 product_id / created_at）
+TECH_STATUS_FIELDS = [
+    "drawing_number", "drawing_version", "software_version", "firmware_version",
+    "hardware_config", "req_baseline", "icd_version", "bom_version", "pcb_version",
+    "hw_serial", "production_batch", "test_status", "qual_status",
+    "change_order", "change_description", "effective_date",
+]
+
+INSERT_TECH_STATUS_SQL = f'''
+    INSERT INTO tech_status (product_id, {", ".join(TECH_STATUS_FIELDS)}, issue_flags, content_hash, created_at)
+    VALUES ({", ".join("?" for _ in range(len(TECH_STATUS_FIELDS) + 4))})
+'''
+
+
+# 重新计算每个产品的最新技术状态（created_at 最大，同一时刻取 id 最大）
+REBUILD_LATEST_STATUS_SQL = '''
+    UPDATE product SET latest_tech_status_id = (
+        SELECT id FROM tech_status
+        WHERE product_id = product.id
+        ORDER BY created_at DESC, id DESC
+        LIMIT 1
+    )
+'''
+
+
+# 某产品（别名 p）在指定日期生效的技术状态 id：生效日期最晚的一条，同一天取录入最晚的；
+# 未填生效日期（或无法识别为 YYYY-MM-DD 开头）的记录按录入时间生效。
+# 两个参数均为截止日期的次日（见 _as_of_bound）
+ISO_DATE_GLOB = "'[0-9][0-9][0-9][0-9]-[0-9][0-9]-[0-9][0-9]*'"
+AS_OF_STATUS_SQL = f'''
+    SELECT id FROM (
+        SELECT * FROM (
+            SELECT id, effective_date AS effective_key, created_at FROM tech_status
+            WHERE product_id = p.id AND effective_date GLOB {ISO_DATE_GLOB} AND effective_date < ?
+            ORDER BY effective_date DESC, created_at DESC, id DESC
+            LIMIT 1
+        )
+        UNION ALL
+        SELECT * FROM (
+            SELECT id, created_at AS effective_key, created_at FROM tech_status
+            WHERE product_id = p.id AND NOT COALESCE(effective_date GLOB {ISO_DATE_GLOB}, 0)
+                AND created_at < ?
+            ORDER BY created_at DESC, id DESC
+            LIMIT 1
+        )
+    )
+    ORDER BY effective_key DESC, created_at DESC, id DESC
+    LIMIT 1
+'''
+
+# 常见的手填日期写法：2024/3/5、2024.03.05、2024-3-5、2024年3月5日，可带时间
+_DATE_PATTERN = re.compile(
+    r"^\s*(\d{4})\s*[-/.年]\s*(\d{1,2})\s*[-/.月]\s*(\d{1,2})\s*日?(?:[\sT]+(.*?))?\s*$"
+)
+
+
+def normalize_date(value):
+    """
+    把日期文本统一为 YYYY-MM-DD（带时间的保留为 "YYYY-MM-DD 时间"）
+
+    无法识别的内容原样返回，空值返回空字符串
+    """
+    if value is None:
+        return ''
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d %H:%M:%S")
+    if isinstance(value, date):
+        return value.strftime("%Y-%m-%d")
+    text = str(value)
+    match = _DATE_PATTERN.match(text)
+    if not match:
+        return text
+    year, month, day, rest = match.groups()
+    try:
+        normalized = date(int(year), int(month), int(day)).strftime("%Y-%m-%d")
+    except ValueError:
+        return text
+    return f"{normalized} {rest}" if rest else normalized
+
+
+def _as_of_bound(as_of):
+    """
+    截止日期的次日（YYYY-MM-DD）
+
+    以 "< 次日" 比较，生效日期或录入时间带时分秒时当天的记录同样计入
+    """
+    if isinstance(as_of, datetime):
+        as_of = as_of.date()
+    elif not isinstance(as_of, date):
+        as_of = datetime.strptime(str(as_of)[:10], "%Y-%m-%d").date()
+    return (as_of + timedelta(days=1)).strftime("%Y-%m-%d")
+
+
+# 全文搜索覆盖的字段：产品基础信息 + 最新技术状态
+SEARCH_PRODUCT_FIELDS = ["product_code", "product_name", "batch_number", "model"]
+SEARCH_STATUS_FIELDS = [
+    "drawing_number", "drawing_version", "software_version", "firmware_version",
+    "hardware_config", "req_baseline", "icd_version", "bom_version", "pcb_version",
+    "hw_serial", "production_batch", "test_status", "qual_status",
+    "change_order", "change_description",
+]
+SEARCH_FIELDS = SEARCH_PRODUCT_FIELDS + SEARCH_STATUS_FIELDS
+
+# trigram 分词至少需要 3 个字符才能走索引
+FTS_MIN_KEYWORD_LENGTH = 3
+
+# 生成 product_fts 行的查询（未删除的产品 + 最新技术状态）
+FTS_ROW_SELECT = f'''
+    SELECT p.id, {", ".join("p." + f for f in SEARCH_PRODUCT_FIELDS)},
+           {", ".join("ts." + f for f in SEARCH_STATUS_FIELDS)}
+    FROM product p
+    LEFT JOIN tech_status ts ON ts.id = p.latest_tech_status_id
+    WHERE p.status != 'inactive'
+'''
+
+FTS_INSERT_SQL = f"INSERT INTO product_fts (rowid, {', '.join(SEARCH_FIELDS)})"
+
+# IN (...) 批量查询每批的参数个数（低于旧版 SQLite 的 999 个变量上限）
+IN_CHUNK_SIZE = 500
+
+# 批量导入时每批处理的行数（导入数据以迭代器传入时内存只与批大小相关）
+IMPORT_BATCH_SIZE = 2000
+
+FTS_TRIGGERS = [
+    "trg_product_fts_insert",
+    "trg_product_fts_update",
+    "trg_product_fts_delete",
+    "trg_tech_status_fts_update",
+]
+
+
+# 导出查询的列（产品字段 + 技术状态字段；历史导出另含状态 id 与录入时间）
+EXPORT_PRODUCT_FIELDS = ["id", "product_code", "product_name", "batch_number", "model", "status", "created_at"]
+EXPORT_HISTORY_FIELDS = ["tech_status_id", "status_created_at"]
+
+
+# 基线引用列（不含快照内容）
+BASELINE_REF_COLUMNS = ["id", "product_id", "baseline_name", "created_at", "product_blob", "status_blob"]
+
+# 基线快照不保存的列：id、时间戳记在 baselines 行上，问题标记与内容指纹由其余字段推导。
+# 去掉这些列后，内容相同的快照哈希相同，对比时不会因此报出差异
+SNAPSHOT_EXCLUDED_COLUMNS = {
+    "product": ("id", "updated_at", "latest_tech_status_id"),
+    "tech_status": ("id", "product_id", "created_at", "issue_flags", "content_hash"),
+}
+
+# 基线对比的字段（产品基础信息 + 技术状态字段），id、时间戳等不参与对比
+BASELINE_DIFF_SECTIONS = [
+    ("product", ["product_code", "product_name", "batch_number", "model", "status", "lifecycle_state"]),
+    ("tech_status", TECH_STATUS_FIELDS),
+]
+
+
+def _snapshot_part(section, value):
+    """去掉 SNAPSHOT_EXCLUDED_COLUMNS 中的列，得到快照片段；value 为 None 时返回 None"""
+    if value is None:
+        return None
+    excluded = SNAPSHOT_EXCLUDED_COLUMNS[section]
+    return {key: item for key, item in value.items() if key not in excluded}
+
+
+def export_columns(history=False):
+    """导出查询结果的列名"""
+    columns = EXPORT_PRODUCT_FIELDS + TECH_STATUS_FIELDS
+    if history:
+        columns = columns + EXPORT_HISTORY_FIELDS
+    return columns
+
+
+def _export_select(history):
+    select = [f"p.{f}" for f in EXPORT_PRODUCT_FIELDS] + [f"ts.{f}" for f in TECH_STATUS_FIELDS]
+    if history:
+        select += ["ts.id AS tech_status_id", "ts.created_at AS status_created_at"]
+    return select
+
+
+def _tech_status_values(data):
+    """按 TECH_STATUS_FIELDS 顺序取值，生效日期统一为 YYYY-MM-DD"""
+    return [
+        normalize_date(data.get(field)) if field == 'effective_date' else data.get(field, '')
+        for field in TECH_STATUS_FIELDS
+    ]
+
+
+def _tech_status_hash(data):
+    """技术状态内容指纹（TECH_STATUS_FIELDS 全部字段），用于识别未变化的导入行"""
+    content = "\x1f".join(str(value or "") for value in _tech_status_values(data))
+    return hashlib.sha1(content.encode("utf-8")).hexdigest()
+
+
+def _tech_status_params(product_id, data, now):
+    """按 INSERT_TECH_STATUS_SQL 的列顺序组装参数（写入时解析问题标记、计算内容指纹）"""
+    flags = classify_issue_flags(data.get('change_order', ''), data.get('change_description', ''))
+    return (
+        product_id, *_tech_status_values(data),
+        flags, _tech_status_hash(data), now,
+    )
+
 
 class DatabaseManager:
     """数据库管理类"""
     
-    def __init__(self, db_path="tsm_data.db"):
+    def __init__(self, db_path="tsm_data.db", storage_profile=None):
         self.db_path = db_path
+        if storage_profile is None:
+            storage_profile = BackupManager().config.get("storage_profile", {})
+        self.pool = ConnectionPool.for_path(db_path, storage_profile)
         self.init_db()
 
     def get_connection(self):
-        """获取数据库连接"""
-        conn = sqlite3.connect(self.db_path)
-        conn.row_factory = sqlite3.Row  # 允许通过列名访问
-        return conn
+        """获取当前线程的共享连接（由连接池管理，调用方不要关闭）"""
+        return self.pool.acquire()
+
+    def get_read_connection(self):
+        """获取当前线程的只读连接（其他线程可调用其 interrupt() 中断正在执行的查询）"""
+        return self.pool.acquire_reader()
+
+    def connection(self):
+        """借用当前线程连接的上下文管理器，退出时提交，异常时回滚"""
+        return self.pool.connection()
+
+    def transaction(self):
+        """显式写事务上下文，整个代码块只提交一次"""
+        return self.pool.transaction()
+
+    def read_connection(self):
+        """只读连接上下文，长查询不会阻塞录入/导入写入"""
+        return self.pool.read_connection()
+
+    def checkpoint(self, mode="PASSIVE"):
+        """执行 WAL checkpoint"""
+        return self.pool.checkpoint(mode)
+
+    def release_thread_connection(self):
+        """释放当前线程的连接（工作线程结束时调用）"""
+        self.pool.release_thread()
+
+    def close(self):
+        """关闭该数据库的全部连接（程序退出时调用）"""
+        self.pool.close_all()
 
     def init_db(self):
         """初始化数据库表结构"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            self._create_schema(conn.cursor())
+
+    def _create_schema(self, cursor):
         
         # 创建产品表
         cursor.execute('''
@@ -90,6 +328,15 @@ class DatabaseManager:
             )
         ''')
 
+        # 基线快照片段：按内容哈希去重、压缩存储，多个基线共用相同的产品/技术状态片段
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS snapshot_blobs (
+                hash TEXT PRIMARY KEY,
+                encoding TEXT NOT NULL,  /* zlib 或 json，见 db/snapshots.py */
+                data BLOB NOT NULL
+            ) WITHOUT ROWID
+        ''')
+
         # V2.0 新增: 附件表 (Attachments)
         cursor.execute('''
             CREATE TABLE IF NOT EXISTS attachments (
@@ -112,6 +359,11 @@ class DatabaseManager:
             cursor.execute("UPDATE product SET lifecycle_state = 'draft' WHERE status = 'draft'")
             cursor.execute("UPDATE product SET lifecycle_state = 'released' WHERE status = 'active'")
 
+        # 性能: product 上物化最新技术状态 id，由触发器维护
+        rebuild_latest = 'latest_tech_status_id' not in columns
+        if rebuild_latest:
+            cursor.execute("ALTER TABLE product ADD COLUMN latest_tech_status_id INTEGER")
+
         # 扩展: 补齐 tech_status 字段
         cursor.execute("PRAGMA table_info(tech_status)")
         tech_columns = [column[1] for column in cursor.fetchall()]
@@ -130,432 +382,1226 @@ class DatabaseManager:
         for col_name, col_type in extra_columns:
             if col_name not in tech_columns:
                 cursor.execute(f"ALTER TABLE tech_status ADD COLUMN {col_name} {col_type}")
+
+        # 性能: 写入时解析的待处理问题标记（见 db/issues.py）
+        rebuild_issues = 'issue_flags' not in tech_columns
+        if rebuild_issues:
+            cursor.execute("ALTER TABLE tech_status ADD COLUMN issue_flags INTEGER NOT NULL DEFAULT 0")
+            self._rebuild_issue_flags(cursor)
+
+        # 性能: 基线快照改存 snapshot_blobs 引用，snapshot_data 仅保留旧数据
+        cursor.execute("PRAGMA table_info(baselines)")
+        baseline_columns = [column[1] for column in cursor.fetchall()]
+        if 'product_blob' not in baseline_columns:
+            cursor.execute("ALTER TABLE baselines ADD COLUMN product_blob TEXT")
+            cursor.execute("ALTER TABLE baselines ADD COLUMN status_blob TEXT")
+            self._migrate_baseline_snapshots(cursor)
+
+        if 'content_hash' not in tech_columns:
+            cursor.execute("ALTER TABLE tech_status ADD COLUMN content_hash TEXT")
+            cursor.execute(f"SELECT id, {', '.join(TECH_STATUS_FIELDS)} FROM tech_status")
+            cursor.executemany(
+                "UPDATE tech_status SET content_hash = ? WHERE id = ?",
+                [(_tech_status_hash(dict(row)), row["id"]) for row in cursor.fetchall()],
+            )
         
         # 创建索引
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_product_code ON product(product_code)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_product_id ON tech_status(product_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_tech_status_id ON change_log(tech_status_id)')
         cursor.execute('CREATE INDEX IF NOT EXISTS idx_change_created_at ON change_log(created_at)')
-        
-        conn.commit()
-        conn.close()
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_tech_status_product_created '
+            'ON tech_status(product_id, created_at, id)'
+        )
+
+        # 按生效日期查询前，先把旧库中手填的非 ISO 生效日期统一格式（仅在首次建该索引时执行）
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'index' AND name = 'idx_tech_status_product_effective'"
+        )
+        if cursor.fetchone() is None:
+            self._normalize_effective_dates(cursor)
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_tech_status_product_effective '
+            'ON tech_status(product_id, effective_date, created_at)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_product_latest_status ON product(latest_tech_status_id)'
+        )
+        # 查询页按 (created_at, id) 键集分页
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_product_status_created ON product(status, created_at, id)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_baselines_product_created ON baselines(product_id, created_at)'
+        )
+        cursor.execute(
+            'CREATE INDEX IF NOT EXISTS idx_tech_status_issues '
+            'ON tech_status(product_id, issue_flags) WHERE issue_flags != 0'
+        )
+
+        self._create_latest_status_triggers(cursor)
+        if rebuild_latest:
+            cursor.execute(REBUILD_LATEST_STATUS_SQL)
+
+        self.fts_enabled = self._create_search_index(cursor)
+
+    def _create_search_index(self, cursor):
+        """
+        创建 FTS5 全文索引（trigram 分词，中文名称/图号可按子串匹配）
+
+        返回是否可用；旧版 SQLite 不支持 trigram 时退回 LIKE 搜索
+        """
+        cursor.execute(
+            "SELECT 1 FROM sqlite_master WHERE type = 'trigger' AND name = 'trg_product_fts_insert'"
+        )
+        needs_rebuild = cursor.fetchone() is None
+        try:
+            cursor.execute(f'''
+                CREATE VIRTUAL TABLE IF NOT EXISTS product_fts USING fts5(
+                    {", ".join(SEARCH_FIELDS)},
+                    tokenize = 'trigram'
+                )
+            ''')
+            cursor.execute("SELECT rowid FROM product_fts LIMIT 1")
+        except sqlite3.OperationalError:
+            # 如 Win7 上 Python 3.8 自带的 SQLite 3.31；移除触发器以免写入失败
+            for name in FTS_TRIGGERS:
+                cursor.execute(f"DROP TRIGGER IF EXISTS {name}")
+            return False
+
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_product_fts_insert
+            AFTER INSERT ON product
+            BEGIN
+                {FTS_INSERT_SQL} {FTS_ROW_SELECT} AND p.id = NEW.id;
+            END
+        ''')
+        # 基础信息、软删除、最新技术状态变化时重建该产品的索引行
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_product_fts_update
+            AFTER UPDATE OF {", ".join(SEARCH_PRODUCT_FIELDS)}, status, latest_tech_status_id ON product
+            WHEN {" OR ".join(
+                f"OLD.{f} IS NOT NEW.{f}"
+                for f in SEARCH_PRODUCT_FIELDS + ["status", "latest_tech_status_id"]
+            )}
+            BEGIN
+                DELETE FROM product_fts WHERE rowid = OLD.id;
+                {FTS_INSERT_SQL} {FTS_ROW_SELECT} AND p.id = NEW.id;
+            END
+        ''')
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_product_fts_delete
+            AFTER DELETE ON product
+            BEGIN
+                DELETE FROM product_fts WHERE rowid = OLD.id;
+            END
+        ''')
+        # 修改的是某产品当前最新技术状态时刷新
+        cursor.execute(f'''
+            CREATE TRIGGER IF NOT EXISTS trg_tech_status_fts_update
+            AFTER UPDATE ON tech_status
+            BEGIN
+                DELETE FROM product_fts WHERE rowid IN (
+                    SELECT id FROM product WHERE latest_tech_status_id = NEW.id
+                );
+                {FTS_INSERT_SQL} {FTS_ROW_SELECT} AND p.latest_tech_status_id = NEW.id;
+            END
+        ''')
+
+        if needs_rebuild:
+            cursor.execute("DELETE FROM product_fts")
+            cursor.execute(f"{FTS_INSERT_SQL} {FTS_ROW_SELECT}")
+        return True
+
+    def rebuild_search_index(self):
+        """重建全文索引"""
+        if not self.fts_enabled:
+            raise RuntimeError("当前 SQLite 版本不支持 FTS5 trigram 全文索引")
+        with self.transaction() as conn:
+            conn.execute("DELETE FROM product_fts")
+            conn.execute(f"{FTS_INSERT_SQL} {FTS_ROW_SELECT}")
+
+    def _create_latest_status_triggers(self, cursor):
+        """维护 product.latest_tech_status_id 的触发器"""
+        # 新状态比当前最新状态更新时替换
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_tech_status_latest_insert
+            AFTER INSERT ON tech_status
+            BEGIN
+                UPDATE product SET latest_tech_status_id = NEW.id
+                WHERE id = NEW.product_id
+                  AND NOT EXISTS (
+                      SELECT 1 FROM tech_status cur
+                      WHERE cur.id = product.latest_tech_status_id
+                        AND (cur.created_at > NEW.created_at
+                             OR (cur.created_at = NEW.created_at AND cur.id > NEW.id))
+                  );
+            END
+        ''')
+        # 修改归属产品或创建时间时，重新计算涉及的产品
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_tech_status_latest_update
+            AFTER UPDATE OF product_id, created_at ON tech_status
+            BEGIN
+                UPDATE product SET latest_tech_status_id = (
+                    SELECT id FROM tech_status
+                    WHERE product_id = product.id
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1
+                )
+                WHERE id IN (OLD.product_id, NEW.product_id);
+            END
+        ''')
+        # 删除的正是最新状态时，回退到上一条
+        cursor.execute('''
+            CREATE TRIGGER IF NOT EXISTS trg_tech_status_latest_delete
+            AFTER DELETE ON tech_status
+            BEGIN
+                UPDATE product SET latest_tech_status_id = (
+                    SELECT id FROM tech_status
+                    WHERE product_id = OLD.product_id
+                    ORDER BY created_at DESC, id DESC
+                    LIMIT 1
+                )
+                WHERE id = OLD.product_id AND latest_tech_status_id = OLD.id;
+            END
+        ''')
+
+    def _rebuild_issue_flags(self, cursor):
+        cursor.execute("SELECT id, change_order, change_description, issue_flags FROM tech_status")
+        updates = []
+        for row in cursor.fetchall():
+            flags = classify_issue_flags(row["change_order"], row["change_description"])
+            if flags != row["issue_flags"]:
+                updates.append((flags, row["id"]))
+        if updates:
+            cursor.executemany("UPDATE tech_status SET issue_flags = ? WHERE id = ?", updates)
+
+    def _normalize_effective_dates(self, cursor):
+        cursor.execute(f'''
+            SELECT id, {', '.join(TECH_STATUS_FIELDS)} FROM tech_status
+            WHERE effective_date > '' AND effective_date NOT GLOB {ISO_DATE_GLOB}
+        ''')
+        updates = []
+        for row in cursor.fetchall():
+            data = dict(row)
+            normalized = normalize_date(data['effective_date'])
+            if normalized != data['effective_date']:
+                updates.append((normalized, _tech_status_hash(data), row["id"]))
+        if updates:
+            cursor.executemany(
+                "UPDATE tech_status SET effective_date = ?, content_hash = ? WHERE id = ?", updates
+            )
+        return len(updates)
+
+    def normalize_effective_dates(self):
+        """把已有技术状态中非 YYYY-MM-DD 格式的生效日期统一格式，返回修正的记录数"""
+        with self.transaction() as conn:
+            return self._normalize_effective_dates(conn.cursor())
+
+    def rebuild_issue_flags(self):
+        """重新解析全部技术状态的问题标记（解析规则调整后执行）"""
+        with self.transaction() as conn:
+            self._rebuild_issue_flags(conn.cursor())
+
+    def rebuild_latest_status(self):
+        """重建全部产品的最新技术状态指针（用于旧库修复）"""
+        with self.transaction() as conn:
+            conn.execute(REBUILD_LATEST_STATUS_SQL)
 
     def insert_product(self, data):
         """
         插入产品
         data: dict, 包含 product_code, product_name, batch_number, model, status (optional)
         """
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         status = data.get('status', 'active')
         lifecycle_state = 'draft' if status == 'draft' else 'released'
         
         try:
-            cursor.execute('''
-                INSERT INTO product (product_code, product_name, batch_number, model, status, lifecycle_state, created_at, updated_at)
-                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-            ''', (
-                data['product_code'],
-                data['product_name'],
-                data['batch_number'],
-                data['model'],
-                status,
-                lifecycle_state,
-                now,
-                now
-            ))
-            product_id = cursor.lastrowid
-            conn.commit()
-            return product_id
+            with self.connection() as conn:
+                cursor = conn.cursor()
+                cursor.execute('''
+                    INSERT INTO product (product_code, product_name, batch_number, model, status, lifecycle_state, created_at, updated_at)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ''', (
+                    data['product_code'],
+                    data['product_name'],
+                    data['batch_number'],
+                    data['model'],
+                    status,
+                    lifecycle_state,
+                    now,
+                    now
+                ))
+                return cursor.lastrowid
         except sqlite3.IntegrityError as e:
             if "UNIQUE constraint failed" in str(e):
                 raise ValueError("产品代号已存在")
             raise e
-        finally:
-            conn.close()
 
-    def search_products(self, keyword=""):
-        """模糊搜索产品（包含最新技术状态）"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        query = """
-            SELECT p.*
-            FROM product p
-            LEFT JOIN tech_status ts ON ts.id = (
-                SELECT id FROM tech_status
-                WHERE product_id = p.id
-                ORDER BY created_at DESC
-                LIMIT 1
+    def _search_source(self, keyword, columns):
+        """
+        搜索的 FROM / WHERE / ORDER BY 片段
+
+        返回 (source, condition, order, params, ranked)，ranked 表示按全文索引相关度排序
+        """
+        fields = list(columns) if columns else list(SEARCH_FIELDS)
+        unknown = [f for f in fields if f not in SEARCH_FIELDS]
+        if unknown:
+            raise ValueError(f"不支持的搜索字段: {', '.join(unknown)}")
+
+        if not keyword:
+            return "product p", "p.status = 'active'", "p.created_at DESC", [], False
+        if self.fts_enabled and len(keyword) >= FTS_MIN_KEYWORD_LENGTH:
+            phrase = '"' + keyword.replace('"', '""') + '"'
+            if columns:
+                phrase = "{" + " ".join(fields) + "} : " + phrase
+            return (
+                "product_fts INNER JOIN product p ON p.id = product_fts.rowid",
+                "product_fts MATCH ? AND p.status = 'active'",
+                "product_fts.rank, p.created_at DESC",
+                [phrase],
+                True,
+            )
+        if self.fts_enabled:
+            # 关键词过短无法使用 trigram，在索引表内做 LIKE 扫描（无需关联技术状态表）
+            conditions = " OR ".join(f"product_fts.{f} LIKE ?" for f in fields)
+            return (
+                "product_fts INNER JOIN product p ON p.id = product_fts.rowid",
+                f"({conditions}) AND p.status = 'active'",
+                "p.created_at DESC",
+                [f"%{keyword}%"] * len(fields),
+                False,
             )
-            WHERE p.status = 'active'
+        conditions = " OR ".join(
+            f"{'p' if f in SEARCH_PRODUCT_FIELDS else 'ts'}.{f} LIKE ?" for f in fields
+        )
+        return (
+            "product p LEFT JOIN tech_status ts ON ts.id = p.latest_tech_status_id",
+            f"p.status = 'active' AND ({conditions})",
+            "p.created_at DESC",
+            [f"%{keyword}%"] * len(fields),
+            False,
+        )
+
+    def search_products(self, keyword="", columns=None, page_size=None, after=None):
         """
-        params = []
-        
-        if keyword:
-            query += """
-                AND (
-                    p.product_code LIKE ? OR p.product_name LIKE ? OR p.batch_number LIKE ? OR p.model LIKE ?
-                    OR ts.drawing_number LIKE ? OR ts.drawing_version LIKE ?
-                    OR ts.software_version LIKE ? OR ts.firmware_version LIKE ?
-                    OR ts.hardware_config LIKE ? OR ts.req_baseline LIKE ? OR ts.icd_version LIKE ?
-                    OR ts.bom_version LIKE ? OR ts.pcb_version LIKE ? OR ts.hw_serial LIKE ?
-                    OR ts.production_batch LIKE ? OR ts.test_status LIKE ? OR ts.qual_status LIKE ?
-                    OR ts.change_order LIKE ? OR ts.change_description LIKE ?
-                )
-            """
-            like_kw = f"%{keyword}%"
-            params.extend([like_kw] * 19)
-            
-        query += " ORDER BY p.created_at DESC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        搜索产品（包含最新技术状态）
+
+        keyword: 关键词，为空时返回全部正式记录
+        columns: 可选，仅在这些字段中搜索（SEARCH_FIELDS 的子集）
+        启用全文索引时按相关度排序，否则按录入时间倒序
+
+        page_size: 可选，按 (created_at, id) 倒序做键集分页，每次最多返回 page_size 条
+            （分页时统一按录入时间倒序；需要按相关度分页时用 search_ranked_ids）
+        after: 上一页最后一条的 (created_at, id)，为 None 时返回第一页
+        """
+        source, condition, order, params, _ = self._search_source(keyword, columns)
+
+        limit = ""
+        if page_size:
+            order = "p.created_at DESC, p.id DESC"
+            if after is not None:
+                # 行值比较可直接在 (status, created_at, id) 索引上定位，翻页深度不影响速度
+                condition += " AND (p.created_at, p.id) < (?, ?)"
+                params.extend([after[0], after[1]])
+            limit = "LIMIT ?"
+            params.append(int(page_size))
+
+        query = f"""
+            SELECT p.* FROM {source}
+            WHERE {condition}
+            ORDER BY {order}
+            {limit}
+        """
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return [dict(row) for row in cursor.fetchall()]
+
+    def search_ranked_ids(self, keyword, columns=None):
+        """
+        按相关度排序的匹配产品 id 列表；关键词不走全文索引（无相关度）时返回 None
+
+        bm25 相关度随库内数据变化，每次查询都会重算，不能作为翻页游标。
+        调用方在搜索时取一次 id 顺序，再用 get_products_in_order 逐页读取，
+        其间的写入不会造成漏行或重复
+        """
+        source, condition, order, params, ranked = self._search_source(keyword, columns)
+        if not ranked:
+            return None
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f"SELECT p.id FROM {source} WHERE {condition} ORDER BY {order}, p.id", params)
+            return [row[0] for row in cursor.fetchall()]
+
+    def get_products_in_order(self, product_ids):
+        """按给定 id 顺序批量获取正式产品，已删除或已停用的跳过"""
+        with self.read_connection() as conn:
+            rows = self._fetch_in_chunks(
+                conn.cursor(),
+                "SELECT * FROM product WHERE id IN ({placeholders}) AND status = 'active'",
+                product_ids,
+            )
+            products = {row["id"]: dict(row) for row in rows}
+        return [products[pid] for pid in product_ids if pid in products]
 
     def get_product(self, product_id):
         """根据ID获取产品详情"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM product WHERE id = ?", (product_id,))
-        row = cursor.fetchone()
-        conn.close()
-        return dict(row) if row else None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM product WHERE id = ?", (product_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
 
     def get_product_by_code(self, product_code):
         """根据产品代号获取产品详情"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM product WHERE product_code = ?", (product_code,))
-        row = cursor.fetchone()
-        conn.close()
-        return dict(row) if row else None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("SELECT * FROM product WHERE product_code = ?", (product_code,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
 
     def update_product_basic(self, product_id, data):
         """更新产品基础信息"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            UPDATE product SET
-                product_name = ?,
-                batch_number = ?,
-                model = ?,
-                updated_at = ?
-            WHERE id = ?
-        ''', (
-            data.get('product_name', ''),
-            data.get('batch_number', ''),
-            data.get('model', ''),
-            datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
-            product_id
-        ))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                UPDATE product SET
+                    product_name = ?,
+                    batch_number = ?,
+                    model = ?,
+                    updated_at = ?
+                WHERE id = ?
+            ''', (
+                data.get('product_name', ''),
+                data.get('batch_number', ''),
+                data.get('model', ''),
+                datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+                product_id
+            ))
 
     def delete_product(self, product_id):
         """删除产品 (软删除)"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE product SET status = 'inactive' WHERE id = ?", (product_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE product SET status = 'inactive' WHERE id = ?", (product_id,))
 
     def insert_tech_status(self, product_id, data):
         """插入技术状态"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.execute('''
-            INSERT INTO tech_status (
-                product_id, drawing_number, drawing_version, 
-                software_version, firmware_version, hardware_config,
-                req_baseline, icd_version, bom_version, pcb_version,
-                hw_serial, production_batch, test_status, qual_status,
-                change_order, change_description, effective_date, created_at
-            ) VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
-        ''', (
-            product_id,
-            data.get('drawing_number', ''),
-            data.get('drawing_version', ''),
-            data.get('software_version', ''),
-            data.get('firmware_version', ''),
-            data.get('hardware_config', ''),
-            data.get('req_baseline', ''),
-            data.get('icd_version', ''),
-            data.get('bom_version', ''),
-            data.get('pcb_version', ''),
-            data.get('hw_serial', ''),
-            data.get('production_batch', ''),
-            data.get('test_status', ''),
-            data.get('qual_status', ''),
-            data.get('change_order', ''),
-            data.get('change_description', ''),
-            data.get('effective_date', ''),
-            now
-        ))
-        
-        tech_status_id = cursor.lastrowid
-        conn.commit()
-        conn.close()
-        return tech_status_id
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(INSERT_TECH_STATUS_SQL, _tech_status_params(product_id, data, now))
+            return cursor.lastrowid
 
     def get_tech_status(self, product_id):
         """根据产品ID获取技术状态"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(
-            "SELECT * FROM tech_status WHERE product_id = ? ORDER BY created_at DESC LIMIT 1",
-            (product_id,),
-        )
-        row = cursor.fetchone()
-        conn.close()
-        return dict(row) if row else None
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT ts.* FROM product p
+                INNER JOIN tech_status ts ON ts.id = p.latest_tech_status_id
+                WHERE p.id = ?
+            ''', (product_id,))
+            row = cursor.fetchone()
+            return dict(row) if row else None
+
+    def get_tech_status_as_of(self, product_id, as_of):
+        """获取产品在指定日期（按生效日期）的技术状态，当时尚无技术状态时返回 None"""
+        bound = _as_of_bound(as_of)
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(f'''
+                SELECT ts.* FROM product p
+                INNER JOIN tech_status ts ON ts.id = ({AS_OF_STATUS_SQL})
+                WHERE p.id = ?
+            ''', (bound, bound, product_id))
+            row = cursor.fetchone()
+            return dict(row) if row else None
 
     def update_tech_status(self, tech_status_id, data):
         """更新技术状态"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        
-        cursor.execute('''
-            UPDATE tech_status SET
-                drawing_number = ?,
-                drawing_version = ?,
-                software_version = ?,
-                firmware_version = ?,
-                hardware_config = ?,
-                req_baseline = ?,
-                icd_version = ?,
-                bom_version = ?,
-                pcb_version = ?,
-                hw_serial = ?,
-                production_batch = ?,
-                test_status = ?,
-                qual_status = ?,
-                change_order = ?,
-                change_description = ?,
-                effective_date = ?
-            WHERE id = ?
-        ''', (
-            data.get('drawing_number', ''),
-            data.get('drawing_version', ''),
-            data.get('software_version', ''),
-            data.get('firmware_version', ''),
-            data.get('hardware_config', ''),
-            data.get('req_baseline', ''),
-            data.get('icd_version', ''),
-            data.get('bom_version', ''),
-            data.get('pcb_version', ''),
-            data.get('hw_serial', ''),
-            data.get('production_batch', ''),
-            data.get('test_status', ''),
-            data.get('qual_status', ''),
-            data.get('change_order', ''),
-            data.get('change_description', ''),
-            data.get('effective_date', ''),
-            tech_status_id
-        ))
+        with self.connection() as conn:
+            cursor = conn.cursor()
         
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                UPDATE tech_status SET
+                    drawing_number = ?,
+                    drawing_version = ?,
+                    software_version = ?,
+                    firmware_version = ?,
+                    hardware_config = ?,
+                    req_baseline = ?,
+                    icd_version = ?,
+                    bom_version = ?,
+                    pcb_version = ?,
+                    hw_serial = ?,
+                    production_batch = ?,
+                    test_status = ?,
+                    qual_status = ?,
+                    change_order = ?,
+                    change_description = ?,
+                    effective_date = ?,
+                    issue_flags = ?,
+                    content_hash = ?
+                WHERE id = ?
+            ''', (
+                data.get('drawing_number', ''),
+                data.get('drawing_version', ''),
+                data.get('software_version', ''),
+                data.get('firmware_version', ''),
+                data.get('hardware_config', ''),
+                data.get('req_baseline', ''),
+                data.get('icd_version', ''),
+                data.get('bom_version', ''),
+                data.get('pcb_version', ''),
+                data.get('hw_serial', ''),
+                data.get('production_batch', ''),
+                data.get('test_status', ''),
+                data.get('qual_status', ''),
+                data.get('change_order', ''),
+                data.get('change_description', ''),
+                normalize_date(data.get('effective_date')),
+                classify_issue_flags(data.get('change_order', ''), data.get('change_description', '')),
+                _tech_status_hash(data),
+                tech_status_id
+            ))
 
     def insert_change_log(self, tech_status_id, change_type, content, operator="系统"):
         """插入变更日志"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
         
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.execute('''
-            INSERT INTO change_log (tech_status_id, change_type, change_content, operator, created_at)
-            VALUES (?, ?, ?, ?, ?)
-        ''', (tech_status_id, change_type, content, operator, now))
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                INSERT INTO change_log (tech_status_id, change_type, change_content, operator, created_at)
+                VALUES (?, ?, ?, ?, ?)
+            ''', (tech_status_id, change_type, content, operator, now))
+
+    def bulk_upsert_products(self, rows, operator="系统", batch_size=IMPORT_BATCH_SIZE, progress=None):
+        """
+        批量导入产品及技术状态（单事务）
+
+        rows: Excel 解析出的记录，列表或迭代器均可（按 batch_size 分批写入），
+              每行包含产品字段与技术状态字段
+        operator: 变更日志操作人
+        progress: 可选回调，每写完一批以已处理行数调用；回调抛出异常时整批导入回滚
+        返回: dict, 包含 created_products, updated_products, inserted_status,
+              unchanged_rows, skipped_rows, errors
+
+        与产品当前状态完全相同的行计入 unchanged_rows，不写技术状态和变更日志
+        """
+        result = {
+            "created_products": 0,
+            "updated_products": 0,
+            "inserted_status": 0,
+            "unchanged_rows": 0,
+            "skipped_rows": 0,
+            "errors": [],
+        }
+        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+
+        rows = iter(rows)
+        start = 1
+        with self.transaction() as conn:
+            cursor = conn.cursor()
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                self._upsert_batch(cursor, batch, start, operator, now, result)
+                start += len(batch)
+                if progress:
+                    progress(start - 1)
+
+        # 大批量导入后截断 WAL，避免文件持续膨胀（外层仍有事务时由外层负责）
+        if result["inserted_status"] >= self.pool.checkpoint_after_rows and not conn.in_transaction:
+            self.checkpoint("TRUNCATE")
+        return result
+
+    def _upsert_batch(self, cursor, rows, start, operator, now, result):
+        # 分批取出本批涉及的已有产品及其最新状态指纹，避免逐行查询或整表加载
+        code_map = {}
+        current = {}
+        for row in self._fetch_in_chunks(
+            cursor,
+            '''
+                SELECT p.product_code, p.id, p.product_name, p.batch_number, p.model, ts.content_hash
+                FROM product p
+                LEFT JOIN tech_status ts ON ts.id = p.latest_tech_status_id
+                WHERE p.product_code IN ({placeholders})
+            ''',
+            (row.get("product_code") for row in rows if row.get("product_code")),
+        ):
+            code_map[row["product_code"]] = row["id"]
+            current[row["product_code"]] = (
+                (row["product_name"], row["batch_number"], row["model"]), row["content_hash"]
+            )
+
+        new_products = {}
+        product_updates = []
+        status_rows = []
+        for idx, row in enumerate(rows, start):
+            product_code = row.get("product_code")
+            product_name = row.get("product_name") or product_code or "未命名"
+            batch_number = row.get("batch_number") or "未填写"
+            model = row.get("model") or "其他"
+
+            if not product_code:
+                result["skipped_rows"] += 1
+                result["errors"].append(f"第{idx}行缺少产品代号")
+                continue
+
+            basic = (product_name, batch_number, model)
+            status_hash = _tech_status_hash(row)
+            if product_code in current:
+                current_basic, current_hash = current[product_code]
+                has_basic = any([row.get("product_name"), row.get("batch_number"), row.get("model")])
+                if has_basic and basic != current_basic:
+                    product_updates.append((*basic, now, product_code))
+                    result["updated_products"] += 1
+                    current_basic = basic
+                if status_hash == current_hash:
+                    result["unchanged_rows"] += 1
+                    current[product_code] = (current_basic, current_hash)
+                    continue
+            else:
+                new_products[product_code] = (
+                    product_code, product_name, batch_number, model,
+                    "active", "released", now, now,
+                )
+                result["created_products"] += 1
+                current_basic = basic
+            current[product_code] = (current_basic, status_hash)
+            status_rows.append((product_code, row))
+
+        if new_products:
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM product")
+            last_product_id = cursor.fetchone()[0]
+            cursor.executemany('''
+                INSERT INTO product (product_code, product_name, batch_number, model, status, lifecycle_state, created_at, updated_at)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+            ''', list(new_products.values()))
+            cursor.execute(
+                "SELECT product_code, id FROM product WHERE id > ?", (last_product_id,)
+            )
+            code_map.update(
+                {row["product_code"]: row["id"] for row in cursor.fetchall()}
+            )
+
+        if product_updates:
+            cursor.executemany('''
+                UPDATE product SET
+                    product_name = ?,
+                    batch_number = ?,
+                    model = ?,
+                    updated_at = ?
+                WHERE product_code = ?
+            ''', product_updates)
+
+        if status_rows:
+            # 写事务内没有其他写者，AUTOINCREMENT 保证新行 id 按插入顺序递增
+            cursor.execute("SELECT COALESCE(MAX(id), 0) FROM tech_status")
+            last_status_id = cursor.fetchone()[0]
+            cursor.executemany(
+                INSERT_TECH_STATUS_SQL,
+                [_tech_status_params(code_map[code], row, now) for code, row in status_rows],
+            )
+            cursor.execute(
+                "SELECT id FROM tech_status WHERE id > ? ORDER BY id", (last_status_id,)
+            )
+            status_ids = [row["id"] for row in cursor.fetchall()]
+
+            logs = [
+                (tech_status_id, "update", f"Excel导入更新 {code}", operator, now)
+                for tech_status_id, (code, row) in zip(status_ids, status_rows)
+                if row.get("change_order") or row.get("change_description")
+            ]
+            if logs:
+                cursor.executemany('''
+                    INSERT INTO change_log (tech_status_id, change_type, change_content, operator, created_at)
+                    VALUES (?, ?, ?, ?, ?)
+                ''', logs)
+            result["inserted_status"] += len(status_ids)
+
+    def _fetch_in_chunks(self, cursor, sql, values, params=(), chunk_size=IN_CHUNK_SIZE):
+        """
+        分批执行 IN (...) 查询，逐行产出结果
+
+        sql 中用 {placeholders} 标记 IN 列表位置，params 为其后的其余参数。
+        最后一批用末尾的值补齐到 chunk_size，使每批语句文本相同、可复用预编译语句。
+        """
+        values = list(dict.fromkeys(values))
+        if not values:
+            return
+        query = sql.format(placeholders=",".join("?" * chunk_size))
+        for start in range(0, len(values), chunk_size):
+            chunk = values[start:start + chunk_size]
+            chunk.extend([chunk[-1]] * (chunk_size - len(chunk)))
+            cursor.execute(query, (*chunk, *params))
+            yield from cursor.fetchall()
+
+    def get_issue_products(self):
+        """
+        获取存在待处理问题的产品（看板用）
+
+        对各产品历史状态的问题标记取并集，只返回有问题的产品，
+        附带最新技术状态字段以及 issue_type / missing_fields
+        """
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                WITH issues AS (
+                    SELECT product_id,
+                           MAX(issue_flags & 1) | MAX(issue_flags & 2) | MAX(issue_flags & 4) AS flags
+                    FROM tech_status
+                    WHERE issue_flags != 0
+                    GROUP BY product_id
+                )
+                SELECT p.*,
+                    ts.drawing_number, ts.drawing_version, ts.software_version, ts.firmware_version,
+                    ts.req_baseline, ts.icd_version, ts.bom_version, ts.pcb_version,
+                    ts.test_status, ts.qual_status, ts.change_order, ts.change_description,
+                    issues.flags AS issue_flags
+                FROM issues
+                INNER JOIN product p ON p.id = issues.product_id
+                LEFT JOIN tech_status ts ON ts.id = p.latest_tech_status_id
+                WHERE p.status != 'inactive' OR p.lifecycle_state = 'obsolete'
+                ORDER BY p.id
+            ''')
+            results = []
+            for row in cursor.fetchall():
+                item = dict(row)
+                item["issue_type"], item["missing_fields"] = product_issue(item.pop("issue_flags"))
+                results.append(item)
+            return results
 
     def get_change_history(self, product_id):
         """获取产品的完整变更历史"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT cl.* FROM change_log cl
-            INNER JOIN tech_status ts ON cl.tech_status_id = ts.id
-            WHERE ts.product_id = ?
-            ORDER BY cl.created_at DESC
-        ''', (product_id,))
+            cursor.execute('''
+                SELECT cl.* FROM change_log cl
+                INNER JOIN tech_status ts ON cl.tech_status_id = ts.id
+                WHERE ts.product_id = ?
+                ORDER BY cl.created_at DESC
+            ''', (product_id,))
         
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
 
     def get_statistics(self):
         """获取统计数据"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
         
-        # 总记录数
-        cursor.execute("SELECT COUNT(*) as total FROM product WHERE status != 'inactive'")
-        total_count = cursor.fetchone()['total']
+            # 总记录数
+            cursor.execute("SELECT COUNT(*) as total FROM product WHERE status != 'inactive'")
+            total_count = cursor.fetchone()['total']
         
-        # 正式记录数
-        cursor.execute("SELECT COUNT(*) as active FROM product WHERE status = 'active'")
-        active_count = cursor.fetchone()['active']
+            # 正式记录数
+            cursor.execute("SELECT COUNT(*) as active FROM product WHERE status = 'active'")
+            active_count = cursor.fetchone()['active']
         
-        # 草稿数
-        cursor.execute("SELECT COUNT(*) as draft FROM product WHERE status = 'draft'")
-        draft_count = cursor.fetchone()['draft']
+            # 草稿数
+            cursor.execute("SELECT COUNT(*) as draft FROM product WHERE status = 'draft'")
+            draft_count = cursor.fetchone()['draft']
         
-        conn.close()
         
-        return {
-            'total_count': total_count,
-            'active_count': active_count,
-            'draft_count': draft_count
-        }
+            return {
+                'total_count': total_count,
+                'active_count': active_count,
+                'draft_count': draft_count
+            }
 
     def get_model_distribution(self):
         """获取型号分布数据"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
         
-        cursor.execute('''
-            SELECT model, COUNT(*) as count 
-            FROM product 
-            WHERE status != 'inactive'
-            GROUP BY model
-            ORDER BY count DESC
-        ''')
-        
-        rows = cursor.fetchall()
-        conn.close()
-        return [(row['model'], row['count']) for row in rows]
-
-    def get_products_with_tech_status(self, keyword="", model_filter=None, status_filter=None, date_from=None, date_to=None):
-        """获取产品及其技术状态的合并数据（用于导出）"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+            cursor.execute('''
+                SELECT model, COUNT(*) as count 
+                FROM product 
+                WHERE status != 'inactive'
+                GROUP BY model
+                ORDER BY count DESC
+            ''')
         
-        query = '''
-            SELECT 
-                p.id, p.product_code, p.product_name, p.batch_number, p.model, p.status, p.created_at,
-                ts.drawing_number, ts.drawing_version, ts.software_version, ts.firmware_version,
-                ts.hardware_config, ts.req_baseline, ts.icd_version, ts.bom_version, ts.pcb_version,
-                ts.hw_serial, ts.production_batch, ts.test_status, ts.qual_status,
-                ts.change_order, ts.change_description, ts.effective_date
-            FROM product p
-            LEFT JOIN tech_status ts ON ts.id = (
-                SELECT id FROM tech_status
-                WHERE product_id = p.id
-                ORDER BY created_at DESC
-                LIMIT 1
-            )
-            WHERE p.status != 'inactive'
-        '''
+            rows = cursor.fetchall()
+            return [(row['model'], row['count']) for row in rows]
+
+    def _export_filters(self, keyword="", model_filter=None, status_filter=None, date_from=None, date_to=None):
+        """导出查询的筛选条件，返回 (WHERE 子句, 参数)"""
+        conditions = ["p.status != 'inactive'"]
         params = []
-        
+
         if keyword:
-            query += " AND (p.product_code LIKE ? OR p.product_name LIKE ?)"
+            conditions.append("(p.product_code LIKE ? OR p.product_name LIKE ?)")
             like_kw = f"%{keyword}%"
             params.extend([like_kw, like_kw])
-        
+
         if model_filter:
-            query += " AND p.model = ?"
+            conditions.append("p.model = ?")
             params.append(model_filter)
-        
+
         if status_filter:
-            query += " AND p.status = ?"
+            conditions.append("p.status = ?")
             params.append(status_filter)
-        
+
         if date_from:
-            query += " AND DATE(p.created_at) >= ?"
+            conditions.append("DATE(p.created_at) >= ?")
             params.append(date_from)
-        
+
         if date_to:
-            query += " AND DATE(p.created_at) <= ?"
+            conditions.append("DATE(p.created_at) <= ?")
             params.append(date_to)
+
+        return " AND ".join(conditions), params
+
+    def get_products_with_tech_status(self, keyword="", model_filter=None, status_filter=None,
+                                      date_from=None, date_to=None, as_of=None):
+        """
+        获取产品及其技术状态的合并数据（用于导出）
+
+        as_of: 可选日期，返回各产品在该日期生效的技术状态（当时尚无技术状态的产品不返回）
+        """
+        return list(self.iter_products_with_tech_status(
+            keyword, model_filter, status_filter, date_from, date_to, as_of=as_of
+        ))
+
+    def iter_products_with_tech_status(self, keyword="", model_filter=None, status_filter=None,
+                                       date_from=None, date_to=None, history=False, batch_size=1000,
+                                       as_of=None):
+        """
+        逐行读取产品及其技术状态（筛选条件同 get_products_with_tech_status）
+
+        history 为 True 时每条历史技术状态各占一行，as_of 指定日期时取该日期生效的状态，
+        否则只取最新状态。以游标 fetchmany 方式产出，导出大量数据时内存占用与总行数无关
+        """
+        batches = self.iter_export_batches(
+            keyword, model_filter, status_filter, date_from, date_to, history, batch_size, as_of
+        )
+        for rows in batches:
+            for row in rows:
+                yield dict(row)
+
+    def iter_export_batches(self, keyword="", model_filter=None, status_filter=None,
+                            date_from=None, date_to=None, history=False, batch_size=5000, as_of=None):
+        """
+        按批产出导出数据（sqlite3.Row 列表，列顺序见 export_columns）
+
+        供 CSV / Parquet 等批量导出直接消费，避免逐行构造字典
+        """
+        where, params = self._export_filters(keyword, model_filter, status_filter, date_from, date_to)
+        join_params = []
+        if history and as_of:
+            raise ValueError("历史导出与按日期导出不能同时使用")
+        if history:
+            join = "LEFT JOIN tech_status ts ON ts.product_id = p.id"
+            order = "p.created_at DESC, p.id, ts.created_at, ts.id"
+        elif as_of:
+            join = f"INNER JOIN tech_status ts ON ts.id = ({AS_OF_STATUS_SQL})"
+            join_params = [_as_of_bound(as_of)] * 2
+            order = "p.created_at DESC"
+        else:
+            join = "LEFT JOIN tech_status ts ON ts.id = p.latest_tech_status_id"
+            order = "p.created_at DESC"
+        query = f'''
+            SELECT {", ".join(_export_select(history))}
+            FROM product p
+            {join}
+            WHERE {where}
+            ORDER BY {order}
+        '''
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, join_params + params)
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                yield rows
+
+    def count_products_with_tech_status(self, keyword="", model_filter=None, status_filter=None,
+                                        date_from=None, date_to=None, history=False, as_of=None):
+        """统计导出查询的行数（用于进度显示和空结果提示）"""
+        where, params = self._export_filters(keyword, model_filter, status_filter, date_from, date_to)
+        query = f"SELECT COUNT(*) FROM product p WHERE {where}"
+        if as_of:
+            query = f"SELECT COUNT(*) FROM product p WHERE EXISTS ({AS_OF_STATUS_SQL}) AND {where}"
+            params = [_as_of_bound(as_of)] * 2 + params
+        elif history:
+            # 没有技术状态的产品在历史导出中也占一行
+            query = f'''
+                SELECT COUNT(*) FROM product p
+                LEFT JOIN tech_status ts ON ts.product_id = p.id
+                WHERE {where}
+            '''
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(query, params)
+            return cursor.fetchone()[0]
+
+        # --- V2.0 Methods ---
+
+    def create_baseline(self, product_id, name, baseline_type, snapshot=None, creator="System"):
+        """
+        创建基线
+
+        snapshot: {'product': 产品, 'tech_status': 最新技术状态或 None}（兼容旧调用传入的 JSON 文本）；
+        为 None 时在同一事务内直接从数据库读取产品及其最新技术状态。
+        两部分分别按内容哈希存入 snapshot_blobs，内容未变的片段与已有基线共用
+        """
+        if snapshot is None:
+            with self.transaction() as conn:
+                self._capture_baselines(conn.cursor(), "p.id = ?", [product_id], name, baseline_type, creator)
+            return
+        if isinstance(snapshot, str):
+            snapshot = json.loads(snapshot)
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+            product_blob = store_blob(cursor, _snapshot_part('product', snapshot.get('product')))
+            status_blob = store_blob(cursor, _snapshot_part('tech_status', snapshot.get('tech_status')))
         
-        query += " ORDER BY p.created_at DESC"
-        
-        cursor.execute(query, params)
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+            cursor.execute('''
+                INSERT INTO baselines (product_id, baseline_name, baseline_type, snapshot_data,
+                                       product_blob, status_blob, created_by, created_at)
+                VALUES (?, ?, ?, '', ?, ?, ?, ?)
+            ''', (product_id, name, baseline_type, product_blob, status_blob, creator, now))
+
+    def create_baselines(self, name, baseline_type, creator="System", keyword="", model_filter=None,
+                         status_filter=None, date_from=None, date_to=None):
+        """
+        按筛选条件批量冻结基线（如整个型号），筛选条件同 get_products_with_tech_status
+
+        全部产品在一个事务内用一条查询读取并写入，基线时间一致。返回创建的基线数
+        """
+        where, params = self._export_filters(keyword, model_filter, status_filter, date_from, date_to)
+        with self.transaction() as conn:
+            return self._capture_baselines(conn.cursor(), where, params, name, baseline_type, creator)
 
-    # --- V2.0 Methods ---
+    def _current_snapshots(self, cursor, where, params):
+        """
+        读取 WHERE 条件选中的产品（别名 p）及其最新技术状态，
+        返回 [(产品 id, 产品片段, 技术状态片段或 None)]，片段不含 SNAPSHOT_EXCLUDED_COLUMNS 中的列
+        """
+        cursor.execute("PRAGMA table_info(product)")
+        product_columns = [column[1] for column in cursor.fetchall()]
+        cursor.execute("PRAGMA table_info(tech_status)")
+        status_columns = [column[1] for column in cursor.fetchall()]
+        split = len(product_columns)
+        select = [f"p.{c}" for c in product_columns] + [f"ts.{c}" for c in status_columns]
 
-    def create_baseline(self, product_id, name, baseline_type, snapshot_data, creator="System"):
-        """创建基线"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
+        cursor.execute(f'''
+            SELECT {", ".join(select)}
+            FROM product p
+            LEFT JOIN tech_status ts ON ts.id = p.latest_tech_status_id
+            WHERE {where}
+            ORDER BY p.id
+        ''', params)
+        snapshots = []
+        for row in cursor.fetchall():
+            product = dict(zip(product_columns, row[:split]))
+            tech_status = dict(zip(status_columns, row[split:])) if row[split] is not None else None
+            snapshots.append((
+                product["id"], _snapshot_part('product', product), _snapshot_part('tech_status', tech_status),
+            ))
+        return snapshots
+
+    def _capture_baselines(self, cursor, where, params, name, baseline_type, creator, batch_size=1000):
+        """为 WHERE 条件选中的产品（别名 p）各创建一条基线，快照为产品及其最新技术状态"""
+        snapshots = self._current_snapshots(cursor, where, params)
         now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
-        
-        cursor.execute('''
-            INSERT INTO baselines (product_id, baseline_name, baseline_type, snapshot_data, created_by, created_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (product_id, name, baseline_type, snapshot_data, creator, now))
-        
-        conn.commit()
-        conn.close()
-
-    def get_baselines(self, product_id):
-        """获取产品的所有基线"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("SELECT * FROM baselines WHERE product_id = ? ORDER BY created_at DESC", (product_id,))
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+
+        count = 0
+        for start in range(0, len(snapshots), batch_size):
+            blobs = {}
+            baselines = []
+            for product_id, product, tech_status in snapshots[start:start + batch_size]:
+                refs = []
+                for value in (product, tech_status):
+                    if value is None:
+                        refs.append(None)
+                        continue
+                    digest, encoding, data = encode_blob(value)
+                    blobs[digest] = (digest, encoding, data)
+                    refs.append(digest)
+                baselines.append((product_id, name, baseline_type, refs[0], refs[1], creator, now))
+            cursor.executemany(
+                "INSERT OR IGNORE INTO snapshot_blobs (hash, encoding, data) VALUES (?, ?, ?)",
+                list(blobs.values()),
+            )
+            cursor.executemany('''
+                INSERT INTO baselines (product_id, baseline_name, baseline_type, snapshot_data,
+                                       product_blob, status_blob, created_by, created_at)
+                VALUES (?, ?, ?, '', ?, ?, ?, ?)
+            ''', baselines)
+            count += len(baselines)
+        return count
+
+    def get_baselines(self, product_id, include_snapshot=False):
+        """
+        获取产品的所有基线
+
+        默认只返回列表字段，不读取快照内容；
+        include_snapshot 为 True 时解码快照，填入 snapshot（dict）与 snapshot_data（JSON 文本）
+        """
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, product_id, baseline_name, baseline_type, created_by, created_at,
+                       product_blob, status_blob
+                FROM baselines WHERE product_id = ? ORDER BY created_at DESC
+            ''', (product_id,))
+            baselines = [dict(row) for row in cursor.fetchall()]
+            if include_snapshot:
+                self._attach_snapshots(cursor, baselines)
+            return baselines
+
+    def get_baseline(self, baseline_id):
+        """获取单个基线（含解码后的快照），不存在时返回 None"""
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT id, product_id, baseline_name, baseline_type, created_by, created_at,
+                       product_blob, status_blob
+                FROM baselines WHERE id = ?
+            ''', (baseline_id,))
+            row = cursor.fetchone()
+            if row is None:
+                return None
+            baseline = dict(row)
+            self._attach_snapshots(cursor, [baseline])
+            return baseline
+
+    def _attach_snapshots(self, cursor, baselines):
+        """为基线解码快照；共用的片段只读取、解压一次"""
+        hashes = [b[key] for b in baselines for key in ('product_blob', 'status_blob') if b[key]]
+        blobs = {
+            row["hash"]: decode_blob(row["encoding"], row["data"])
+            for row in self._fetch_in_chunks(
+                cursor, "SELECT hash, encoding, data FROM snapshot_blobs WHERE hash IN ({placeholders})",
+                hashes,
+            )
+        }
+        legacy = [b["id"] for b in baselines if not b['product_blob']]
+        legacy_data = {
+            row["id"]: row["snapshot_data"]
+            for row in self._fetch_in_chunks(
+                cursor, "SELECT id, snapshot_data FROM baselines WHERE id IN ({placeholders})", legacy
+            )
+        }
+        for baseline in baselines:
+            if baseline['product_blob']:
+                snapshot = {
+                    'product': blobs.get(baseline['product_blob']),
+                    'tech_status': blobs.get(baseline['status_blob']),
+                }
+            else:
+                # 迁移时无法解析的旧快照，原样返回
+                text = legacy_data.get(baseline["id"]) or "{}"
+                try:
+                    snapshot = json.loads(text)
+                except ValueError:
+                    snapshot = {}
+            baseline['snapshot'] = snapshot
+            baseline['snapshot_data'] = json.dumps(snapshot, ensure_ascii=False)
+
+    def get_baseline_names(self):
+        """按名称汇总基线（批量冻结的基线同名），返回 [(名称, 产品数, 最近创建时间)]，最近的在前"""
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT baseline_name, COUNT(DISTINCT product_id) AS products, MAX(created_at) AS created_at
+                FROM baselines
+                GROUP BY baseline_name
+                ORDER BY MAX(created_at) DESC
+            ''')
+            return [(row["baseline_name"], row["products"], row["created_at"]) for row in cursor.fetchall()]
+
+    def diff_baseline(self, baseline_id, other_id=None):
+        """
+        单个基线与另一基线（other_id）或该产品当前状态对比
+
+        返回差异条目（格式见 diff_baseline_sets），没有差异时返回 None
+        """
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute(
+                f"SELECT {', '.join(BASELINE_REF_COLUMNS)} FROM baselines WHERE id IN (?, ?)",
+                (baseline_id, other_id),
+            )
+            rows = {row["id"]: dict(row) for row in cursor.fetchall()}
+            if baseline_id not in rows:
+                raise ValueError(f"基线不存在: {baseline_id}")
+            product_id = rows[baseline_id]["product_id"]
+            old = {product_id: rows[baseline_id]}
+            if other_id is None:
+                new = self._current_sides(cursor, "p.id = ?", [product_id])
+            elif other_id in rows:
+                new = {product_id: rows[other_id]}
+            else:
+                raise ValueError(f"基线不存在: {other_id}")
+            entries = self._diff_sides(cursor, old, new)
+            return entries[0] if entries else None
+
+    def diff_baseline_sets(self, name, other_name=None, model_filter=None):
+        """
+        批量对比：名称为 name 的基线与名称为 other_name 的基线，或与各产品当前状态（other_name 为 None）
+
+        同一产品有多条同名基线时取最新一条；model_filter 按产品当前型号筛选，
+        与当前状态对比且未指定型号时，范围为基线涉及的产品及其型号。
+        先比较快照片段哈希，只有哈希不同的产品才解码并逐字段对比。
+        返回差异条目列表（按产品代号排序），每项:
+            product_id, product_code, product_name, model,
+            change: changed（有字段变化）/ added（仅对比方有）/ removed（仅基线有）,
+            changes: [{'section': product/tech_status, 'field', 'old', 'new'}]
+        """
+        with self.read_connection() as conn:
+            cursor = conn.cursor()
+            old = self._baseline_sides(cursor, name, model_filter)
+            if other_name is None:
+                where, params = self._export_filters(model_filter=model_filter)
+                if not model_filter:
+                    # 未指定型号时只看基线涉及的型号，其他型号的产品不算新增
+                    where += ''' AND (p.id IN (SELECT product_id FROM baselines WHERE baseline_name = ?)
+                                   OR p.model IN (SELECT bp.model FROM baselines b
+                                                  JOIN product bp ON bp.id = b.product_id
+                                                  WHERE b.baseline_name = ?))'''
+                    params += [name, name]
+                new = self._current_sides(cursor, where, params)
+            else:
+                new = self._baseline_sides(cursor, other_name, model_filter)
+            return self._diff_sides(cursor, old, new)
+
+    def _baseline_sides(self, cursor, name, model_filter=None):
+        """读取某名称的基线引用（不含快照内容），返回 {product_id: 基线}"""
+        query = f'''
+            SELECT {", ".join("b." + c for c in BASELINE_REF_COLUMNS)}
+            FROM baselines b
+            JOIN product p ON p.id = b.product_id
+            WHERE b.baseline_name = ?
+        '''
+        params = [name]
+        if model_filter:
+            query += " AND p.model = ?"
+            params.append(model_filter)
+        cursor.execute(query + " ORDER BY b.created_at, b.id", params)
+        return {row["product_id"]: dict(row) for row in cursor.fetchall()}
+
+    def _current_sides(self, cursor, where, params):
+        """当前状态一侧：快照已在内存中，哈希现算，返回 {product_id: {...}}"""
+        sides = {}
+        for product_id, product, tech_status in self._current_snapshots(cursor, where, params):
+            sides[product_id] = {
+                "product_blob": blob_hash(product),
+                "status_blob": blob_hash(tech_status) if tech_status is not None else None,
+                "snapshot": {"product": product, "tech_status": tech_status},
+            }
+        return sides
+
+    def _diff_sides(self, cursor, old, new):
+        """对比两侧快照；哈希相同的产品直接跳过，其余按需解码后逐字段对比"""
+        pending = []
+        decode = []
+        for product_id in set(old) | set(new):
+            a, b = old.get(product_id), new.get(product_id)
+            if a and b and a["product_blob"] and (a["product_blob"], a["status_blob"]) == (
+                b["product_blob"], b["status_blob"]
+            ):
+                continue
+            pending.append((product_id, a, b))
+            decode.extend(side for side in (a, b) if side and "snapshot" not in side)
+        self._attach_snapshots(cursor, decode)
+
+        entries = []
+        for product_id, a, b in pending:
+            old_snapshot = a["snapshot"] if a else {}
+            new_snapshot = b["snapshot"] if b else {}
+            changes = []
+            for section, fields in BASELINE_DIFF_SECTIONS:
+                for field, old_value, new_value in diff_fields(
+                    old_snapshot.get(section), new_snapshot.get(section), fields
+                ):
+                    changes.append({"section": section, "field": field, "old": old_value, "new": new_value})
+            if a and b and not changes:
+                # 只有不对比的字段不同（如旧版本基线快照中保存的 id、时间戳）
+                continue
+            product = new_snapshot.get("product") or old_snapshot.get("product") or {}
+            entries.append({
+                "product_id": product_id,
+                "product_code": product.get("product_code", ""),
+                "product_name": product.get("product_name", ""),
+                "model": product.get("model", ""),
+                "change": "changed" if a and b else ("added" if b else "removed"),
+                "changes": changes,
+            })
+        entries.sort(key=lambda entry: (entry["product_code"] or "", entry["product_id"]))
+        return entries
+
+    def _migrate_baseline_snapshots(self, cursor):
+        """把旧基线的 JSON 快照拆分存入 snapshot_blobs，并清空 snapshot_data"""
+        cursor.execute("SELECT id, snapshot_data FROM baselines WHERE snapshot_data != ''")
+        updates = []
+        for row in cursor.fetchall():
+            try:
+                snapshot = json.loads(row["snapshot_data"])
+            except ValueError:
+                continue
+            if not isinstance(snapshot, dict) or not snapshot.get('product'):
+                continue
+            updates.append((
+                store_blob(cursor, _snapshot_part('product', snapshot.get('product'))),
+                store_blob(cursor, _snapshot_part('tech_status', snapshot.get('tech_status'))),
+                row["id"],
+            ))
+        cursor.executemany(
+            "UPDATE baselines SET product_blob = ?, status_blob = ?, snapshot_data = '' WHERE id = ?",
+            updates,
+        )
 
     def add_attachment(self, owner_type, owner_id, file_name, file_path, description=""):
         """添加附件"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            now = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         
-        cursor.execute('''
-            INSERT INTO attachments (owner_type, owner_id, file_name, file_path, description, uploaded_at)
-            VALUES (?, ?, ?, ?, ?, ?)
-        ''', (owner_type, owner_id, file_name, file_path, description, now))
-        
-        conn.commit()
-        conn.close()
+            cursor.execute('''
+                INSERT INTO attachments (owner_type, owner_id, file_name, file_path, description, uploaded_at)
+                VALUES (?, ?, ?, ?, ?, ?)
+            ''', (owner_type, owner_id, file_name, file_path, description, now))
 
     def get_attachments(self, owner_type, owner_id):
         """获取附件列表"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute('''
-            SELECT * FROM attachments 
-            WHERE owner_type = ? AND owner_id = ? 
-            ORDER BY uploaded_at DESC
-        ''', (owner_type, owner_id))
-        rows = cursor.fetchall()
-        conn.close()
-        return [dict(row) for row in rows]
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute('''
+                SELECT * FROM attachments 
+                WHERE owner_type = ? AND owner_id = ? 
+                ORDER BY uploaded_at DESC
+            ''', (owner_type, owner_id))
+            rows = cursor.fetchall()
+            return [dict(row) for row in rows]
 
     def delete_attachment(self, attachment_id):
         """删除附件"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("DELETE FROM attachments WHERE id = ?", (attachment_id,))
-        conn.commit()
-        conn.close()
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("DELETE FROM attachments WHERE id = ?", (attachment_id,))
 
     def update_lifecycle_state(self, product_id, new_state):
         """更新生命周期状态"""
-        conn = self.get_connection()
-        cursor = conn.cursor()
-        cursor.execute("UPDATE product SET lifecycle_state = ? WHERE id = ?", (new_state, product_id))
+        with self.connection() as conn:
+            cursor = conn.cursor()
+            cursor.execute("UPDATE product SET lifecycle_state = ? WHERE id = ?", (new_state, product_id))
         
-        # 同时更新旧的 status 字段以保持兼容性
-        legacy_status = 'active' if new_state == 'released' else 'draft' if new_state == 'draft' else 'inactive' if new_state == 'obsolete' else 'active'
-        cursor.execute("UPDATE product SET status = ? WHERE id = ?", (legacy_status, product_id))
+            # 同时更新旧的 status 字段以保持兼容性
+            legacy_status = 'active' if new_state == 'released' else 'draft' if new_state == 'draft' else 'inactive' if new_state == 'obsolete' else 'active'
+            cursor.execute("UPDATE product SET status = ? WHERE id = ?", (legacy_status, product_id))
         
-        conn.commit()
-        conn.close()
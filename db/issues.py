@@ -0,0 +1,70 @@
+# -*- coding: utf-8 -*-
+"""待处理问题识别：在写入技术状态时解析带标签的更改字段"""
+
+# tech_status.issue_flags 位标记
+ISSUE_MISSING_DOC = 1        # 有更改建议单但缺少更改单号
+ISSUE_MISSING_DRAWING = 2    # 有更改建议单但缺少涉及图样/文件
+ISSUE_NOT_IMPLEMENTED = 4    # 有更改单号但未落实
+
+LABEL_SUGGESTION_ORDER = "更改建议单号"
+LABEL_DOC_NO = "更改单号/技术通知单号/工艺更改单号"
+LABEL_SUGGESTION_DRAWING = "更改建议单涉及图样/文件"
+LABEL_IMPLEMENT_STATUS = "已落实情况"
+
+PLACEHOLDER_VALUES = {"——", "--", "-", "—"}
+
+
+def extract_labeled_value(text, label):
+    """从 "标签:值; 标签:值" 格式的文本中提取指定标签的值"""
+    if not text:
+        return ""
+    for part in str(text).split(";"):
+        part = part.strip()
+        if not part:
+            continue
+        if part.startswith(f"{label}:"):
+            return part[len(label) + 1:].strip()
+    return ""
+
+
+def is_effective(value):
+    if not value:
+        return False
+    return value.strip() not in PLACEHOLDER_VALUES
+
+
+def classify_issue_flags(change_order, change_description):
+    """计算单条技术状态的问题标记"""
+    suggestion_order = extract_labeled_value(change_order, LABEL_SUGGESTION_ORDER)
+    doc_no = extract_labeled_value(change_order, LABEL_DOC_NO)
+    suggestion_drawing = extract_labeled_value(change_description, LABEL_SUGGESTION_DRAWING)
+    implement_status = extract_labeled_value(change_description, LABEL_IMPLEMENT_STATUS)
+
+    flags = 0
+    if is_effective(suggestion_order):
+        if not is_effective(doc_no):
+            flags |= ISSUE_MISSING_DOC
+        if not is_effective(suggestion_drawing):
+            flags |= ISSUE_MISSING_DRAWING
+    if not flags and is_effective(doc_no):
+        if not is_effective(implement_status) or implement_status.strip() != "已落实":
+            flags |= ISSUE_NOT_IMPLEMENTED
+    return flags
+
+
+def product_issue(flags):
+    """
+    由产品全部历史状态的标记并集得出看板分类
+
+    返回 (issue_type, missing_fields)；缺失更改优先于未落实
+    """
+    missing_fields = []
+    if flags & ISSUE_MISSING_DOC:
+        missing_fields.append(LABEL_DOC_NO)
+    if flags & ISSUE_MISSING_DRAWING:
+        missing_fields.append(LABEL_SUGGESTION_DRAWING)
+    if missing_fields:
+        return "missing_change", missing_fields
+    if flags & ISSUE_NOT_IMPLEMENTED:
+        return "not_implemented", [LABEL_IMPLEMENT_STATUS]
+    return None, []
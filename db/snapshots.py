@@ -0,0 +1,67 @@
+# -*- coding: utf-8 -*-
+"""基线快照存储：按内容寻址、压缩保存产品与技术状态快照"""
+import hashlib
+import json
+import zlib
+
+# snapshot_blobs.encoding 取值
+ENCODING_ZLIB = "zlib"    # zlib 压缩的 JSON
+ENCODING_JSON = "json"    # 未压缩的 JSON（压缩后反而更大的小对象）
+
+
+def canonical_json(value):
+    """规范化 JSON：键排序、无多余空白，相同内容得到相同字节"""
+    return json.dumps(value, ensure_ascii=False, sort_keys=True, separators=(",", ":"))
+
+
+def blob_hash(value):
+    """快照片段的内容哈希（规范化 JSON 的 SHA-1），与 encode_blob 返回的哈希一致"""
+    return hashlib.sha1(canonical_json(value).encode("utf-8")).hexdigest()
+
+
+def encode_blob(value):
+    """
+    编码一个快照片段
+
+    返回 (哈希, encoding, data)；哈希取规范化 JSON 的 SHA-1，内容相同的片段共用一行
+    """
+    raw = canonical_json(value).encode("utf-8")
+    digest = hashlib.sha1(raw).hexdigest()
+    packed = zlib.compress(raw, 6)
+    if len(packed) < len(raw):
+        return digest, ENCODING_ZLIB, packed
+    return digest, ENCODING_JSON, raw
+
+
+def decode_blob(encoding, data):
+    """解码 snapshot_blobs 中的一行"""
+    if encoding == ENCODING_ZLIB:
+        data = zlib.decompress(data)
+    return json.loads(bytes(data).decode("utf-8"))
+
+
+def store_blob(cursor, value):
+    """写入快照片段（已存在时复用），返回哈希；value 为 None 时返回 None"""
+    if value is None:
+        return None
+    digest, encoding, data = encode_blob(value)
+    cursor.execute(
+        "INSERT OR IGNORE INTO snapshot_blobs (hash, encoding, data) VALUES (?, ?, ?)",
+        (digest, encoding, data),
+    )
+    return digest
+
+
+def _text(value):
+    return "" if value is None else str(value)
+
+
+def diff_fields(old, new, fields):
+    """逐字段对比两个快照片段（None 与空字符串视为相同），返回 [(字段, 旧值, 新值)]"""
+    old = old or {}
+    new = new or {}
+    return [
+        (field, old.get(field), new.get(field))
+        for field in fields
+        if _text(old.get(field)) != _text(new.get(field))
+    ]
@@ -0,0 +1,75 @@
+# -*- coding: utf-8 -*-
+"""数据库维护工具
+
+用法:
+    python db_maintenance.py --rebuild-latest    重建产品最新技术状态指针
+    python db_maintenance.py --rebuild-fts       重建全文搜索索引
+    python db_maintenance.py --rebuild-issues    重新解析待处理问题标记
+    python db_maintenance.py --normalize-dates   统一生效日期格式为 YYYY-MM-DD
+    python db_maintenance.py --export out.csv --history
+                                                 导出数据（.csv / .parquet / .arrow）
+    python db_maintenance.py --export out.csv --as-of 2026-03-31
+                                                 导出各产品在指定日期生效的技术状态
+"""
+import argparse
+from db.database import DatabaseManager
+from utils.csv_exporter import CsvExporter
+from utils.parquet_exporter import ParquetExporter
+
+
+def main():
+    parser = argparse.ArgumentParser(description="技术状态数据库维护")
+    parser.add_argument("--db", default="tsm_data.db", help="数据库文件路径")
+    parser.add_argument("--rebuild-latest", action="store_true", help="重建产品最新技术状态指针")
+    parser.add_argument("--rebuild-fts", action="store_true", help="重建全文搜索索引")
+    parser.add_argument("--rebuild-issues", action="store_true", help="重新解析待处理问题标记")
+    parser.add_argument("--normalize-dates", action="store_true", help="统一生效日期格式为 YYYY-MM-DD")
+    parser.add_argument("--export", metavar="PATH", help="导出数据，格式由扩展名决定（.csv / .parquet / .arrow）")
+    parser.add_argument("--history", action="store_true", help="导出全部历史技术状态（配合 --export）")
+    parser.add_argument("--as-of", metavar="YYYY-MM-DD", help="导出指定日期生效的技术状态（配合 --export）")
+    args = parser.parse_args()
+    if args.history and args.as_of:
+        parser.error("--history 与 --as-of 不能同时使用")
+
+    db = DatabaseManager(args.db)
+    did_something = False
+
+    if args.rebuild_latest:
+        print("正在重建最新技术状态指针...")
+        db.rebuild_latest_status()
+        did_something = True
+
+    if args.rebuild_fts:
+        print("正在重建全文搜索索引...")
+        db.rebuild_search_index()
+        did_something = True
+
+    if args.rebuild_issues:
+        print("正在重新解析待处理问题标记...")
+        db.rebuild_issue_flags()
+        did_something = True
+
+    if args.normalize_dates:
+        print("正在统一生效日期格式...")
+        count = db.normalize_effective_dates()
+        print(f"已修正 {count} 条记录")
+        did_something = True
+
+    if args.export:
+        print(f"正在导出到 {args.export} ...")
+        if args.export.lower().endswith(".csv"):
+            count = CsvExporter.export_query(db, args.export, history=args.history, as_of=args.as_of)
+        else:
+            count = ParquetExporter.export_query(db, args.export, history=args.history, as_of=args.as_of)
+        print(f"已导出 {count} 行")
+        did_something = True
+
+    if not did_something:
+        parser.print_help()
+    else:
+        print("✅ 维护完成")
+    db.close()
+
+
+if __name__ == "__main__":
+    main()
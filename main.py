@@ -1,6 +1,7 @@
 # -*- coding: utf-8 -*-
 import sys
 import os
+import multiprocessing
 import traceback
 from datetime import datetime
 
@@ -55,4 +56,6 @@ def main():
         raise
 
 if __name__ == "__main__":
+    # 打包后的程序中，导入任务的解析子进程需要
+    multiprocessing.freeze_support()
     main()
@@ -7,8 +7,57 @@ from PyQt5.QtCore import Qt
 from PyQt5.QtGui import QFont
 from db.database import DatabaseManager
 import os
-import json
 from ui.theme import THEME, scale_px, scale_pt, get_font_scale
+from utils.excel_exporter import ExcelExporter, FIELD_LABELS
+
+
+class BaselineDiffDialog(QDialog):
+    """基线对比结果（逐字段列出变化）"""
+
+    def __init__(self, entry, title, parent=None):
+        super().__init__(parent)
+        self.setWindowTitle(title)
+        self.resize(760, 480)
+        self.entry = entry
+
+        layout = QVBoxLayout(self)
+        changes = entry["changes"] if entry else []
+        layout.addWidget(QLabel(f"共 {len(changes)} 个字段发生变化" if changes else "没有差异"))
+
+        table = QTableWidget(len(changes), 3)
+        table.setHorizontalHeaderLabels(["字段", "基线值", "对比值"])
+        table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        table.setEditTriggers(QTableWidget.NoEditTriggers)
+        for i, change in enumerate(changes):
+            table.setItem(i, 0, QTableWidgetItem(FIELD_LABELS.get(change["field"], change["field"])))
+            table.setItem(i, 1, QTableWidgetItem("" if change["old"] is None else str(change["old"])))
+            table.setItem(i, 2, QTableWidgetItem("" if change["new"] is None else str(change["new"])))
+        layout.addWidget(table)
+
+        footer = QHBoxLayout()
+        footer.addStretch()
+        btn_export = QPushButton("导出")
+        btn_export.setEnabled(bool(changes))
+        btn_export.clicked.connect(self.export_diff)
+        btn_close = QPushButton("关闭")
+        btn_close.setObjectName("GhostButton")
+        btn_close.clicked.connect(self.accept)
+        footer.addWidget(btn_export)
+        footer.addWidget(btn_close)
+        layout.addLayout(footer)
+
+    def export_diff(self):
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出对比结果", "", "Excel Files (*.xlsx)")
+        if not file_path:
+            return
+        if not file_path.lower().endswith(".xlsx"):
+            file_path += ".xlsx"
+        try:
+            ExcelExporter.export_baseline_diff([self.entry], file_path)
+            QMessageBox.information(self, "成功", f"对比结果已导出到:\n{file_path}")
+        except Exception as e:
+            QMessageBox.critical(self, "导出失败", str(e))
+
 
 class DetailDialog(QDialog):
     """产品详情弹窗 (V2.0 - CM2增强版)"""
@@ -171,7 +220,13 @@ class DetailDialog(QDialog):
         toolbar = QHBoxLayout()
         btn_create = QPushButton("创建基线快照")
         btn_create.clicked.connect(self.create_baseline)
+        btn_diff_current = QPushButton("与当前状态对比")
+        btn_diff_current.clicked.connect(self.diff_with_current)
+        btn_diff_pair = QPushButton("对比所选两个基线")
+        btn_diff_pair.clicked.connect(self.diff_selected_baselines)
         toolbar.addWidget(btn_create)
+        toolbar.addWidget(btn_diff_current)
+        toolbar.addWidget(btn_diff_pair)
         toolbar.addStretch()
         layout.addLayout(toolbar)
         
@@ -180,6 +235,8 @@ class DetailDialog(QDialog):
         self.baseline_table.setColumnCount(4)
         self.baseline_table.setHorizontalHeaderLabels(["基线名称", "类型", "创建人", "创建时间"])
         self.baseline_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.baseline_table.setSelectionBehavior(QTableWidget.SelectRows)
+        self.baseline_table.setEditTriggers(QTableWidget.NoEditTriggers)
         layout.addWidget(self.baseline_table)
         
         self.load_baselines()
@@ -270,14 +327,8 @@ class DetailDialog(QDialog):
         """创建基线"""
         name, ok = QInputDialog.getText(self, "创建基线", "请输入基线名称 (如: 功能基线 V1.0):")
         if ok and name:
-            # 获取完整数据快照
-            snapshot = {
-                'product': self.product_data,
-                'tech_status': self.db.get_tech_status(self.product_data['id'])
-            }
-            snapshot_json = json.dumps(snapshot, ensure_ascii=False)
-            
-            self.db.create_baseline(self.product_data['id'], name, "Manual", snapshot_json)
+            # 在同一事务内读取产品及最新技术状态作为快照
+            self.db.create_baseline(self.product_data['id'], name, "Manual")
             self.load_baselines()
             QMessageBox.information(self, "成功", "基线快照已创建！")
 
@@ -286,11 +337,39 @@ class DetailDialog(QDialog):
         baselines = self.db.get_baselines(self.product_data['id'])
         self.baseline_table.setRowCount(len(baselines))
         for i, b in enumerate(baselines):
-            self.baseline_table.setItem(i, 0, QTableWidgetItem(b['baseline_name']))
+            name_item = QTableWidgetItem(b['baseline_name'])
+            name_item.setData(Qt.UserRole, b['id'])
+            self.baseline_table.setItem(i, 0, name_item)
             self.baseline_table.setItem(i, 1, QTableWidgetItem(b['baseline_type']))
             self.baseline_table.setItem(i, 2, QTableWidgetItem(b['created_by']))
             self.baseline_table.setItem(i, 3, QTableWidgetItem(b['created_at']))
 
+    def selected_baselines(self):
+        """当前选中的基线 [(id, 名称)]，按列表顺序（新的在前）"""
+        rows = sorted({index.row() for index in self.baseline_table.selectedIndexes()})
+        items = [self.baseline_table.item(row, 0) for row in rows]
+        return [(item.data(Qt.UserRole), item.text()) for item in items if item is not None]
+
+    def diff_with_current(self):
+        """所选基线与产品当前状态对比"""
+        selected = self.selected_baselines()
+        if len(selected) != 1:
+            QMessageBox.information(self, "提示", "请选择一个基线")
+            return
+        baseline_id, name = selected[0]
+        entry = self.db.diff_baseline(baseline_id)
+        BaselineDiffDialog(entry, f"基线对比 - {name} → 当前状态", self).exec_()
+
+    def diff_selected_baselines(self):
+        """对比所选的两个基线（较早的作为基准）"""
+        selected = self.selected_baselines()
+        if len(selected) != 2:
+            QMessageBox.information(self, "提示", "请按住 Ctrl 选择两个基线")
+            return
+        (new_id, new_name), (old_id, old_name) = selected
+        entry = self.db.diff_baseline(old_id, new_id)
+        BaselineDiffDialog(entry, f"基线对比 - {old_name} → {new_name}", self).exec_()
+
     def add_attachment(self):
         """添加附件"""
         file_path, _ = QFileDialog.getOpenFileName(self, "选择文件")
@@ -14,12 +14,11 @@ from PyQt5.QtWidgets import (
     QVBoxLayout,
     QScrollArea,
     QSizePolicy,
-    QFileDialog,
 )
 from PyQt5.QtCore import QDate, pyqtSignal
 from db.database import DatabaseManager
 from ui.theme import THEME
-from utils.excel_importer import ExcelImporter
+from ui.import_runner import ImportRunner
 
 class EntryWidget(QWidget):
     """状态录入界面"""
@@ -29,7 +28,8 @@ class EntryWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.db = DatabaseManager()
-        self.importer = ExcelImporter()
+        self.import_runner = ImportRunner(self.db, self)
+        self.import_runner.finished.connect(lambda summary: self.refresh_data())
         self.init_ui()
 
     def init_ui(self):
@@ -261,90 +261,16 @@ class EntryWidget(QWidget):
         """正式提交"""
         self._save_data(status='active')
 
+    def shutdown(self):
+        """停止后台导入线程（窗口关闭时调用）"""
+        self.import_runner.shutdown()
+
     def refresh_data(self):
         self.refresh_product_list()
         self.data_updated.emit()
 
     def import_excel(self):
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择Excel文件", "", "Excel Files (*.xlsx)"
-        )
-        if not file_path:
-            return
-
-        try:
-            parsed = self.importer.parse(file_path)
-        except Exception as exc:
-            QMessageBox.critical(self, "导入失败", f"解析Excel失败:\n{exc}")
-            return
-
-        rows = parsed["rows"]
-        if not rows:
-            QMessageBox.information(self, "导入提示", "未识别到有效数据行")
-            return
-
-        created_products = 0
-        updated_products = 0
-        inserted_status = 0
-        skipped_rows = 0
-        errors = []
-
-        for idx, row in enumerate(rows, 1):
-            product_code = row.get("product_code")
-            product_name = row.get("product_name") or product_code or "未命名"
-            batch_number = row.get("batch_number") or "未填写"
-            model = row.get("model") or "其他"
-
-            if not product_code:
-                skipped_rows += 1
-                errors.append(f"第{idx}行缺少产品代号")
-                continue
-
-            product = self.db.get_product_by_code(product_code)
-            if product:
-                if any([row.get("product_name"), row.get("batch_number"), row.get("model")]):
-                    self.db.update_product_basic(
-                        product["id"],
-                        {
-                            "product_name": product_name,
-                            "batch_number": batch_number,
-                            "model": model,
-                        },
-                    )
-                    updated_products += 1
-                product_id = product["id"]
-            else:
-                try:
-                    product_id = self.db.insert_product(
-                        {
-                            "product_code": product_code,
-                            "product_name": product_name,
-                            "batch_number": batch_number,
-                            "model": model,
-                            "status": "active",
-                        }
-                    )
-                    created_products += 1
-                except Exception as exc:
-                    skipped_rows += 1
-                    errors.append(f"第{idx}行产品创建失败: {exc}")
-                    continue
-
-            tech_status_id = self.db.insert_tech_status(product_id, row)
-            if row.get("change_order") or row.get("change_description"):
-                log_content = f"Excel导入更新 {product_code}"
-                self.db.insert_change_log(tech_status_id, "update", log_content)
-            inserted_status += 1
-
-        message = (
-            f"导入完成\n新增产品: {created_products}\n更新产品: {updated_products}"
-            f"\n新增技术状态: {inserted_status}\n跳过行数: {skipped_rows}"
-        )
-        if errors:
-            message += "\n\n错误示例:\n" + "\n".join(errors[:5])
-        QMessageBox.information(self, "导入结果", message)
-        self.refresh_product_list()
-        self.data_updated.emit()
+        self.import_runner.choose_and_start()
 
     def _save_data(self, status='active'):
         """保存数据"""
@@ -0,0 +1,136 @@
+from PyQt5.QtWidgets import QProgressDialog, QMessageBox, QFileDialog
+from PyQt5.QtCore import Qt, QObject, QThread, pyqtSignal
+from utils.import_job import ImportJob, format_import_summary
+
+
+class ImportWorker(QThread):
+    """Excel 导入后台线程：解析与写库都不占用界面线程"""
+
+    progress = pyqtSignal(object)
+    completed = pyqtSignal(object)
+    failed = pyqtSignal(str)
+
+    def __init__(self, db, file_paths, operator="系统", parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.file_paths = file_paths
+        self.operator = operator
+
+    def run(self):
+        try:
+            job = ImportJob(self.db, self.file_paths, operator=self.operator)
+            summary = job.run(
+                on_progress=lambda progress: self.progress.emit(dict(progress)),
+                is_cancelled=self.isInterruptionRequested,
+            )
+            self.completed.emit(summary)
+        except Exception as exc:
+            self.failed.emit(str(exc))
+        finally:
+            self.db.release_thread_connection()
+
+
+class ImportRunner(QObject):
+    """
+    录入页与看板页共用的导入流程
+
+    选择文件 -> 后台导入并显示进度 -> 弹出结果汇总；
+    取消时回滚正在写入的工作表，已完成的工作表保留。
+    """
+
+    finished = pyqtSignal(object)
+
+    def __init__(self, db, parent_widget):
+        super().__init__(parent_widget)
+        self.db = db
+        self.parent_widget = parent_widget
+        self.worker = None
+        self.dialog = None
+        self._summary = None
+        self._error = None
+
+    def is_running(self):
+        return self.worker is not None
+
+    def choose_and_start(self):
+        if self.is_running():
+            QMessageBox.information(self.parent_widget, "导入提示", "已有导入任务正在进行")
+            return
+        file_paths, _ = QFileDialog.getOpenFileNames(
+            self.parent_widget, "选择Excel文件（可多选）", "", "Excel Files (*.xlsx)"
+        )
+        if file_paths:
+            self.start(file_paths)
+
+    def start(self, file_paths, operator="系统"):
+        self.dialog = QProgressDialog("正在读取工作表...", "取消", 0, 0, self.parent_widget)
+        self.dialog.setWindowTitle("导入Excel")
+        self.dialog.setWindowModality(Qt.WindowModal)
+        self.dialog.setMinimumDuration(0)
+        self.dialog.setAutoClose(False)
+        self.dialog.setAutoReset(False)
+        self.dialog.canceled.connect(self.cancel)
+
+        self.worker = ImportWorker(self.db, file_paths, operator, self)
+        self.worker.progress.connect(self._on_progress)
+        self.worker.completed.connect(self._on_completed)
+        self.worker.failed.connect(self._on_failed)
+        self.worker.finished.connect(self._on_worker_finished)
+        self.worker.start()
+        self.dialog.show()
+
+    def cancel(self):
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            if self.dialog is not None:
+                self.dialog.setLabelText("正在取消，回滚当前工作表...")
+
+    def shutdown(self):
+        """窗口关闭时停止导入（当前工作表回滚）"""
+        if self.worker is not None:
+            self.worker.requestInterruption()
+            self.worker.wait()
+
+    def _on_progress(self, progress):
+        if self.dialog is None or self.worker.isInterruptionRequested():
+            return
+        self.dialog.setMaximum(max(progress["sheets_total"], 1))
+        self.dialog.setValue(progress["sheets_done"])
+        self.dialog.setLabelText(
+            f"工作表 {progress['sheets_done']}/{progress['sheets_total']}\n"
+            f"已解析 {progress['rows_parsed']} 行，已写入 {progress['rows_written']} 行"
+        )
+
+    def _on_completed(self, summary):
+        self._summary = summary
+
+    def _on_failed(self, message):
+        self._error = message
+
+    def _on_worker_finished(self):
+        # 线程完全结束后再提示结果，保证随后可以立即开始新的导入
+        self.worker.deleteLater()
+        self.worker = None
+        self._close_dialog()
+        summary, error = self._summary, self._error
+        self._summary = self._error = None
+        if error is not None:
+            QMessageBox.critical(self.parent_widget, "导入失败", f"导入Excel失败:\n{error}")
+            return
+        if summary is None:
+            return
+        rows = summary["inserted_status"] + summary["unchanged_rows"] + summary["skipped_rows"]
+        if not rows and not summary["cancelled"]:
+            QMessageBox.information(
+                self.parent_widget, "导入提示", "未识别到有效数据行\n\n" + format_import_summary(summary)
+            )
+        else:
+            QMessageBox.information(self.parent_widget, "导入结果", format_import_summary(summary))
+        self.finished.emit(summary)
+
+    def _close_dialog(self):
+        if self.dialog is not None:
+            self.dialog.canceled.disconnect(self.cancel)
+            self.dialog.close()
+            self.dialog.deleteLater()
+            self.dialog = None
@@ -1,11 +1,13 @@
+import sqlite3
 from PyQt5.QtWidgets import (QWidget, QHBoxLayout, QVBoxLayout, QLabel,
-                             QScrollArea, QFrame, QApplication, QPushButton,
-                             QFileDialog, QMessageBox, QLineEdit)
-from PyQt5.QtCore import Qt, pyqtSignal, QMimeData
-from PyQt5.QtGui import QDrag, QPixmap, QColor
+                             QFrame, QMessageBox,
+                             QLineEdit, QListView, QStyledItemDelegate, QStyle)
+from PyQt5.QtCore import (Qt, pyqtSignal, QMimeData, QThread, QTimer, QMutex, QMutexLocker,
+                          QAbstractListModel, QModelIndex, QRect, QRectF, QSize)
+from PyQt5.QtGui import QColor, QFont, QFontMetrics, QPainter, QPainterPath, QPen
 from db.database import DatabaseManager
-from ui.theme import THEME, scale_px
-from utils.excel_importer import ExcelImporter
+from ui.theme import THEME, scale_px, get_font_scale
+from ui.import_runner import ImportRunner
 
 def rgba_color(hex_color, alpha):
     color = QColor(hex_color)
@@ -15,175 +17,343 @@ def darker_color(hex_color, factor=160):
     color = QColor(hex_color)
     return color.darker(factor).name()
 
-class KanbanCard(QFrame):
-    """看板卡片 - 高仿 Teambition 风格"""
-    
-    clicked = pyqtSignal(int)
-    
-    def __init__(self, data, state_color="#e07a5f"):
-        super().__init__()
-        self.data = data
+def card_owner(data):
+    """从更改说明中提取责任人"""
+    change_desc = data.get("change_description", "")
+    if change_desc:
+        for part in change_desc.split(";"):
+            part = part.strip()
+            if part.startswith("更改人:"):
+                owner = part[len("更改人:"):].strip()
+                if owner not in {"——", "--", "-", "—"}:
+                    return owner
+                break
+    return ""
+
+def card_signature(data):
+    """卡片内容指纹：只包含卡片上展示的字段及当前字体缩放"""
+    return hash((
+        data.get("product_code"),
+        data.get("product_name"),
+        data.get("issue_type"),
+        data.get("issue_label"),
+        data.get("missing_prefix"),
+        tuple(data.get("missing_fields", [])),
+        data.get("change_description"),
+        str(data.get("created_at", "")),
+        data.get("drawing_version"),
+        get_font_scale(),
+    ))
+
+class KanbanLoadWorker(QThread):
+    """看板后台加载线程"""
+
+    loaded = pyqtSignal(int, object)
+    failed = pyqtSignal(int, str)
+
+    def __init__(self, db, collect, generation, search_text, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.collect = collect
+        self.generation = generation
+        self.search_text = search_text
+        # 本线程的只读连接，cancel() 时中断其上正在执行的查询
+        self._reader = None
+        self._reader_lock = QMutex()
+
+    def cancel(self):
+        """请求取消：设置中断标记，并中断正在执行的数据库查询"""
+        self.requestInterruption()
+        with QMutexLocker(self._reader_lock):
+            if self._reader is not None:
+                self._reader.interrupt()
+
+    def run(self):
+        try:
+            with QMutexLocker(self._reader_lock):
+                self._reader = self.db.get_read_connection()
+            board = self.collect(self.search_text, self.isInterruptionRequested)
+            if board is not None and not self.isInterruptionRequested():
+                self.loaded.emit(self.generation, board)
+        except sqlite3.OperationalError as exc:
+            # 被 cancel() 中断的查询抛出 "interrupted"，按取消处理
+            if not self.isInterruptionRequested():
+                self.failed.emit(self.generation, str(exc))
+        except Exception as exc:
+            self.failed.emit(self.generation, str(exc))
+        finally:
+            with QMutexLocker(self._reader_lock):
+                self._reader = None
+            self.db.release_thread_connection()
+
+class KanbanCardModel(QAbstractListModel):
+    """看板卡片数据模型（按产品 id 增量同步）"""
+
+    CardDataRole = Qt.UserRole + 1
+    ProductIdRole = Qt.UserRole + 2
+    SignatureRole = Qt.UserRole + 3
+
+    def __init__(self, parent=None):
+        super().__init__(parent)
+        self._items = []
+        self._signatures = []
+
+    def rowCount(self, parent=QModelIndex()):
+        if parent.isValid():
+            return 0
+        return len(self._items)
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or index.row() >= len(self._items):
+            return None
+        item = self._items[index.row()]
+        if role == Qt.DisplayRole:
+            return item.get("product_name", "")
+        if role == self.CardDataRole:
+            return item
+        if role == self.ProductIdRole:
+            return item["id"]
+        if role == self.SignatureRole:
+            return self._signatures[index.row()]
+        return None
+
+    def flags(self, index):
+        if not index.isValid():
+            return Qt.NoItemFlags
+        return Qt.ItemIsEnabled | Qt.ItemIsSelectable | Qt.ItemIsDragEnabled
+
+    def supportedDragActions(self):
+        return Qt.MoveAction
+
+    def mimeTypes(self):
+        return ["text/plain"]
+
+    def mimeData(self, indexes):
+        mime = QMimeData()
+        if indexes:
+            mime.setText(str(self._items[indexes[0].row()]["id"]))
+        return mime
+
+    def set_cards(self, cards_data):
+        """
+        按产品 id 增量同步
+
+        只对移除/新增/内容变化的行发出对应信号，未变化的行保持不动；
+        首次加载或剩余卡片相对顺序变化时整体重置。返回内容变化的行数。
+        """
+        wanted_ids = {data["id"] for data in cards_data}
+        for row in range(len(self._items) - 1, -1, -1):
+            if self._items[row]["id"] not in wanted_ids:
+                self.beginRemoveRows(QModelIndex(), row, row)
+                del self._items[row]
+                del self._signatures[row]
+                self.endRemoveRows()
+
+        existing_ids = [item["id"] for item in self._items]
+        existing_set = set(existing_ids)
+        if not existing_ids or (
+            [data["id"] for data in cards_data if data["id"] in existing_set] != existing_ids
+        ):
+            self.beginResetModel()
+            self._items = list(cards_data)
+            self._signatures = [card_signature(data) for data in cards_data]
+            self.endResetModel()
+            return len(cards_data)
+
+        changed = 0
+        for row, data in enumerate(cards_data):
+            signature = card_signature(data)
+            if row < len(self._items) and self._items[row]["id"] == data["id"]:
+                self._items[row] = data
+                if self._signatures[row] != signature:
+                    self._signatures[row] = signature
+                    index = self.index(row)
+                    self.dataChanged.emit(index, index)
+                    changed += 1
+                continue
+            self.beginInsertRows(QModelIndex(), row, row)
+            self._items.insert(row, data)
+            self._signatures.insert(row, signature)
+            self.endInsertRows()
+        return changed
+
+    def clear(self):
+        self.beginResetModel()
+        self._items = []
+        self._signatures = []
+        self.endResetModel()
+
+class KanbanCardDelegate(QStyledItemDelegate):
+    """看板卡片绘制代理 - 高仿 Teambition 风格，只绘制可见卡片"""
+
+    CARD_GAP = 12
+    PAD_X = 16
+    PAD_Y = 14
+    SPACING = 10
+    MIN_WIDTH = 240
+
+    def __init__(self, state_color, view):
+        super().__init__(view)
         self.state_color = state_color
-        self._drag_start_pos = None
-        
-        # 基础样式
-        self.setMinimumWidth(240)
-        self.setStyleSheet(f"""
-            KanbanCard {{
-                background-color: {THEME['bg_panel']};
-                border: 1px solid {THEME['border']};
-                border-radius: 12px;
-                border-top: 3px solid {self.state_color};
-            }}
-            KanbanCard:hover {{
-                border-color: {self.state_color};
-            }}
-            QLabel {{ border: none; background: transparent; color: {THEME['text']}; }}
-        """)
-        self.init_ui()
-        
-    def init_ui(self):
-        layout = QVBoxLayout(self)
-        layout.setContentsMargins(16, 14, 16, 14)
-        layout.setSpacing(10)
-        
+        self.view = view
+        # (内容指纹, 宽度) -> 高度
+        self._height_cache = {}
+
+    def clear_cache(self):
+        self._height_cache.clear()
+
+    def _fonts(self, base_font):
+        code_font = QFont(base_font)
+        code_font.setPixelSize(scale_px(13))
+        code_font.setBold(True)
+        name_font = QFont(base_font)
+        name_font.setPixelSize(scale_px(16))
+        name_font.setBold(True)
+        small_font = QFont(base_font)
+        small_font.setPixelSize(scale_px(11))
+        tag_font = QFont(small_font)
+        tag_font.setWeight(QFont.DemiBold)
+        return code_font, name_font, small_font, tag_font
+
+    def _card_width(self):
+        return max(self.MIN_WIDTH, self.view.viewport().width() - 2 * self.CARD_GAP)
+
+    def _missing_text(self, data):
+        missing = data.get("missing_fields", [])
+        if not missing:
+            return ""
+        return f"{data.get('missing_prefix', '缺失')}: " + " / ".join(missing)
+
+    def _card_height(self, data, width, base_font):
+        code_font, name_font, small_font, tag_font = self._fonts(base_font)
+        inner = width - 2 * self.PAD_X
+        height = 3 + self.PAD_Y
+        height += QFontMetrics(code_font).height() + self.SPACING
+        name = data.get("product_name", "无名称")
+        height += QFontMetrics(name_font).boundingRect(
+            QRect(0, 0, inner, 100000), Qt.TextWordWrap, name
+        ).height() + self.SPACING
+        height += max(20, QFontMetrics(tag_font).height() + 6) + self.SPACING
+        height += 1 + self.SPACING
+        height += QFontMetrics(small_font).height()
+        missing_text = self._missing_text(data)
+        if missing_text:
+            height += self.SPACING + QFontMetrics(tag_font).boundingRect(
+                QRect(0, 0, inner, 100000), Qt.TextWordWrap, missing_text
+            ).height()
+        return height + self.PAD_Y
+
+    def sizeHint(self, option, index):
+        data = index.data(KanbanCardModel.CardDataRole) or {}
+        width = self._card_width()
+        key = (index.data(KanbanCardModel.SignatureRole), width)
+        height = self._height_cache.get(key)
+        if height is None:
+            height = self._card_height(data, width, option.font)
+            self._height_cache[key] = height
+        top_gap = self.CARD_GAP if index.row() == 0 else 0
+        return QSize(width + 2 * self.CARD_GAP, top_gap + height + self.CARD_GAP)
+
+    def paint(self, painter, option, index):
+        data = index.data(KanbanCardModel.CardDataRole) or {}
+        code_font, name_font, small_font, tag_font = self._fonts(option.font)
+        top_gap = self.CARD_GAP if index.row() == 0 else 0
+        card = QRect(option.rect).adjusted(self.CARD_GAP, top_gap, -self.CARD_GAP, -self.CARD_GAP)
+        state_color = QColor(self.state_color)
+        hovered = bool(option.state & QStyle.State_MouseOver)
+
+        painter.save()
+        painter.setRenderHint(QPainter.Antialiasing, True)
+
+        # 卡片背景与边框（顶部 3px 状态色）
+        path = QPainterPath()
+        path.addRoundedRect(QRectF(card).adjusted(0.5, 0.5, -0.5, -0.5), 12, 12)
+        painter.fillPath(path, QColor(THEME["bg_panel"]))
+        painter.setPen(QPen(state_color if hovered else QColor(THEME["border"]), 1))
+        painter.drawPath(path)
+        painter.save()
+        painter.setClipPath(path)
+        painter.fillRect(QRect(card.left(), card.top(), card.width(), 3), state_color)
+        painter.restore()
+
+        inner = card.adjusted(self.PAD_X, 3 + self.PAD_Y, -self.PAD_X, -self.PAD_Y)
+        y = inner.top()
+
         # 1. 标题区
-        title_lbl = QLabel(f"{self.data.get('product_code', '')}")
-        title_lbl.setStyleSheet(
-            f"color: {THEME['text_muted']}; font-size: {scale_px(13)}px; font-weight: 700;"
-        )
-        layout.addWidget(title_lbl)
-        
-        content_lbl = QLabel(self.data.get('product_name', '无名称'))
-        content_lbl.setWordWrap(True)
-        content_lbl.setStyleSheet(
-            f"color: {THEME['text']}; font-size: {scale_px(16)}px; font-weight: 700; line-height: 1.4;"
+        painter.setFont(code_font)
+        painter.setPen(QColor(THEME["text_muted"]))
+        code_h = QFontMetrics(code_font).height()
+        painter.drawText(QRect(inner.left(), y, inner.width(), code_h),
+                         Qt.AlignLeft | Qt.AlignVCenter,
+                         QFontMetrics(code_font).elidedText(
+                             str(data.get("product_code", "")), Qt.ElideRight, inner.width()))
+        y += code_h + self.SPACING
+
+        painter.setFont(name_font)
+        painter.setPen(QColor(THEME["text"]))
+        name = data.get("product_name", "无名称")
+        name_rect = QFontMetrics(name_font).boundingRect(
+            QRect(inner.left(), y, inner.width(), 100000), Qt.TextWordWrap, name
         )
-        layout.addWidget(content_lbl)
-        
-        # 2. 标签区
-        tags_layout = QHBoxLayout()
-        tags_layout.setSpacing(6)
-        
-        # 状态标签
-        state_name = self.data.get("issue_label", "缺失更改")
-        state_icon = "●"
-        state_bg = rgba_color(self.state_color, 0.12)
-        state_text = darker_color(self.state_color)
-        if self.data.get("issue_type") == "not_implemented":
-            state_name = self.data.get("issue_label", "未落实")
-            state_icon = "●"
-            state_bg = rgba_color(self.state_color, 0.12)
-            state_text = darker_color(self.state_color)
-        
-        tag = QLabel(f"{state_icon} {state_name}")
-        tag.setStyleSheet(f"""
-            background-color: {state_bg}; color: {state_text};
-            padding: 3px 8px; border-radius: 6px; font-size: {scale_px(11)}px; font-weight: 600;
-        """)
-        tag.setMinimumHeight(20)
-        tags_layout.addWidget(tag)
-        tags_layout.addStretch()
-        
-        # 模拟头像 + 责任人
-        change_desc = self.data.get("change_description", "")
-        owner = ""
-        if change_desc:
-            for part in change_desc.split(";"):
-                part = part.strip()
-                if part.startswith("更改人:"):
-                    owner = part[len("更改人:"):].strip()
-                    break
-        avatar = QLabel("👤")
-        avatar.setStyleSheet(f"font-size: {scale_px(13)}px; color: {THEME['text_muted']};")
-        tags_layout.addWidget(avatar)
-        if owner and owner not in {"——", "--", "-", "—"}:
-            owner_label = QLabel(owner)
-            owner_label.setStyleSheet(
-                f"color: {THEME['text_muted']}; font-size: {scale_px(11)}px;"
-            )
-            tags_layout.addWidget(owner_label)
-        
-        layout.addLayout(tags_layout)
-        
+        painter.drawText(QRect(inner.left(), y, inner.width(), name_rect.height()),
+                         Qt.TextWordWrap, name)
+        y += name_rect.height() + self.SPACING
+
+        # 2. 标签区：状态标签 + 责任人
+        tag_fm = QFontMetrics(tag_font)
+        tag_h = max(20, tag_fm.height() + 6)
+        default_label = "未落实" if data.get("issue_type") == "not_implemented" else "缺失更改"
+        tag_text = f"● {data.get('issue_label', default_label)}"
+        tag_rect = QRect(inner.left(), y, tag_fm.horizontalAdvance(tag_text) + 16, tag_h)
+        tag_bg = QColor(state_color)
+        tag_bg.setAlphaF(0.12)
+        painter.setPen(Qt.NoPen)
+        painter.setBrush(tag_bg)
+        painter.drawRoundedRect(tag_rect, 6, 6)
+        painter.setFont(tag_font)
+        painter.setPen(QColor(darker_color(self.state_color)))
+        painter.drawText(tag_rect, Qt.AlignCenter, tag_text)
+
+        painter.setFont(small_font)
+        painter.setPen(QColor(THEME["text_muted"]))
+        owner = card_owner(data)
+        owner_text = f"👤 {owner}" if owner else "👤"
+        painter.drawText(QRect(tag_rect.right() + 6, y, inner.right() - tag_rect.right() - 6, tag_h),
+                         Qt.AlignRight | Qt.AlignVCenter, owner_text)
+        y += tag_h + self.SPACING
+
         # 3. 分割线
-        line = QFrame()
-        line.setFrameShape(QFrame.HLine)
-        line.setStyleSheet(f"background-color: {THEME['border']}; border: none; height: 1px;")
-        layout.addWidget(line)
-        
+        painter.fillRect(QRect(inner.left(), y, inner.width(), 1), QColor(THEME["border"]))
+        y += 1 + self.SPACING
+
         # 4. 底部信息
-        footer = QHBoxLayout()
-        footer.setSpacing(10)
-        
-        created_at = str(self.data.get('created_at', ''))[:10]
-        ver = self.data.get('drawing_version', 'V1.0')
-        
-        l1 = QLabel(f"创建: {created_at}")
-        l1.setStyleSheet(f"color: {THEME['text_muted']}; font-size: {scale_px(11)}px;")
-        l2 = QLabel(f"版本 {ver}")
-        l2.setStyleSheet(f"color: {THEME['accent']}; font-size: {scale_px(11)}px; font-weight: 600;")
-        
-        footer.addWidget(l1)
-        footer.addStretch()
-        footer.addWidget(l2)
-        layout.addLayout(footer)
+        small_h = QFontMetrics(small_font).height()
+        footer_rect = QRect(inner.left(), y, inner.width(), small_h)
+        created_at = str(data.get("created_at", ""))[:10]
+        painter.drawText(footer_rect, Qt.AlignLeft | Qt.AlignVCenter, f"创建: {created_at}")
+        painter.setFont(tag_font)
+        painter.setPen(QColor(THEME["accent"]))
+        painter.drawText(footer_rect, Qt.AlignRight | Qt.AlignVCenter,
+                         f"版本 {data.get('drawing_version', 'V1.0')}")
+        y += small_h
 
         # 5. 缺失提示
-        missing = self.data.get("missing_fields", [])
-        if missing:
-            prefix = self.data.get("missing_prefix", "缺失")
-            missing_label = QLabel(f"{prefix}: " + " / ".join(missing))
-            missing_label.setWordWrap(True)
-            missing_label.setStyleSheet(
-                f"color: {THEME['danger']}; font-size: {scale_px(11)}px; font-weight: 600;"
-            )
-            layout.addWidget(missing_label)
+        missing_text = self._missing_text(data)
+        if missing_text:
+            y += self.SPACING
+            painter.setPen(QColor(THEME["danger"]))
+            painter.drawText(QRect(inner.left(), y, inner.width(), inner.bottom() - y + 1),
+                             Qt.TextWordWrap, missing_text)
 
-    def mousePressEvent(self, event):
-        if event.button() == Qt.LeftButton:
-            self._drag_start_pos = event.pos()
-            
-    def mouseMoveEvent(self, event):
-        if not self._drag_start_pos:
-            return
-            
-        if (event.pos() - self._drag_start_pos).manhattanLength() < QApplication.startDragDistance():
-            return
-            
-        drag = QDrag(self)
-        mime = QMimeData()
-        mime.setText(str(self.data['id']))
-        drag.setMimeData(mime)
-        self.setStyleSheet(
-            f"background-color: {THEME['bg_panel']}; border: 1px dashed {THEME['border']}; "
-            f"border-top: 3px solid {self.state_color};"
-        )
-        
-        pixmap = QPixmap(self.size())
-        self.render(pixmap)
-        drag.setPixmap(pixmap)
-        drag.setHotSpot(event.pos())
-        
-        drag.exec_(Qt.MoveAction)
-        self._drag_start_pos = None # Reset
-        
-        # 恢复样式? 需要一种机制，或者在 load_data 时重置
-        
-    def mouseReleaseEvent(self, event):
-        if self._drag_start_pos:
-            # If we released without dragging, it's a click
-            self.clicked.emit(self.data['id'])
-            self._drag_start_pos = None
+        painter.restore()
 
 class KanbanColumn(QWidget):
-    """看板列"""
+    """看板列（QListView + 绘制代理，只为可见卡片付出绘制成本）"""
     
     card_clicked = pyqtSignal(int)
     
     def __init__(self, title, state_key, color="#e07a5f", allow_drop=False):
         super().__init__()
-        # ... (rest of init)
         self.title = title
         self.state_key = state_key
         self.color = color
@@ -195,7 +365,6 @@ class KanbanColumn(QWidget):
         self.init_ui()
         
     def init_ui(self):
-        # ... (same as before)
         layout = QVBoxLayout(self)
         layout.setContentsMargins(0, 0, 0, 0)
         layout.setSpacing(0)
@@ -239,20 +408,26 @@ class KanbanColumn(QWidget):
         layout.addWidget(title_box)
         
         # 卡片区域
-        self.scroll = QScrollArea()
-        self.scroll.setWidgetResizable(True)
-        self.scroll.setFrameShape(QFrame.NoFrame)
-        self.scroll.setStyleSheet("QScrollArea { border: none; background: transparent; }")
-        
-        self.card_container = QWidget()
-        self.card_container.setStyleSheet("background: transparent;")
-        self.card_layout = QVBoxLayout(self.card_container)
-        self.card_layout.setContentsMargins(12, 12, 12, 12)
-        self.card_layout.setSpacing(12)
-        self.card_layout.addStretch()
-        
-        self.scroll.setWidget(self.card_container)
-        layout.addWidget(self.scroll)
+        self.model = KanbanCardModel(self)
+        self.view = QListView()
+        self.view.setModel(self.model)
+        self.delegate = KanbanCardDelegate(self.color, self.view)
+        self.view.setItemDelegate(self.delegate)
+        self.view.setFrameShape(QFrame.NoFrame)
+        self.view.setStyleSheet("QListView { border: none; background: transparent; }")
+        self.view.setHorizontalScrollBarPolicy(Qt.ScrollBarAlwaysOff)
+        self.view.setVerticalScrollMode(QListView.ScrollPerPixel)
+        self.view.setResizeMode(QListView.Adjust)
+        self.view.setSelectionMode(QListView.SingleSelection)
+        self.view.setFocusPolicy(Qt.NoFocus)
+        self.view.setMouseTracking(True)
+        self.view.viewport().setAttribute(Qt.WA_Hover, True)
+        # 只允许拖出；放置事件交给列本身处理
+        self.view.setDragEnabled(True)
+        self.view.setDragDropMode(QListView.DragOnly)
+        self.view.setDefaultDropAction(Qt.MoveAction)
+        self.view.clicked.connect(self._on_card_clicked)
+        layout.addWidget(self.view)
 
     def apply_font_scale(self, scale):
         if hasattr(self, "lbl_title"):
@@ -269,27 +444,28 @@ class KanbanColumn(QWidget):
             font-weight: 600;
         """
         )
-
-    def add_card(self, card_data):
-        card = KanbanCard(card_data, self.color)
-        card.clicked.connect(self.card_clicked.emit) # Forward signal
-        # 插入到 stretch 之前
-        count = self.card_layout.count()
-        self.card_layout.insertWidget(count - 1, card)
+        self.delegate.clear_cache()
+        self.view.doItemsLayout()
+
+    def _on_card_clicked(self, index):
+        self.view.clearSelection()
+        product_id = index.data(KanbanCardModel.ProductIdRole)
+        if product_id is not None:
+            self.card_clicked.emit(product_id)
+
+    def set_cards(self, cards_data):
+        """按产品 id 增量同步卡片，只重绘新增/内容变化的卡片"""
+        if self.model.set_cards(cards_data):
+            self.view.doItemsLayout()
         self.update_count()
 
     def clear_cards(self):
-        # 保留最后一个 stretch item
-        while self.card_layout.count() > 1:
-            item = self.card_layout.takeAt(0)
-            if item.widget():
-                item.widget().deleteLater()
+        self.model.clear()
+        self.delegate.clear_cache()
         self.update_count()
 
     def update_count(self):
-        # 减去 stretch
-        count = self.card_layout.count() - 1
-        self.lbl_count.setText(str(count))
+        self.lbl_count.setText(str(self.model.rowCount()))
 
     def dragEnterEvent(self, event):
         if not self.allow_drop:
@@ -312,10 +488,20 @@ class KanbanWidget(QWidget):
     
     card_clicked = pyqtSignal(int)
     
+    # 搜索框输入防抖间隔（毫秒）
+    SEARCH_DEBOUNCE_MS = 300
+
     def __init__(self):
         super().__init__()
         self.db = DatabaseManager()
-        self.importer = ExcelImporter()
+        self.import_runner = ImportRunner(self.db, self)
+        self.import_runner.finished.connect(lambda summary: self.load_data())
+        self._workers = []
+        self._load_generation = 0
+        self._search_timer = QTimer(self)
+        self._search_timer.setSingleShot(True)
+        self._search_timer.setInterval(self.SEARCH_DEBOUNCE_MS)
+        self._search_timer.timeout.connect(self.load_data)
         self.setStyleSheet(f"background-color: {THEME['bg_app']};")
         self.init_ui()
         
@@ -330,7 +516,7 @@ class KanbanWidget(QWidget):
         self.search_input = QLineEdit()
         self.search_input.setPlaceholderText("搜索产品代号/名称/批次/型号/图号")
         self.search_input.setClearButtonEnabled(True)
-        self.search_input.textChanged.connect(self.load_data)
+        self.search_input.textChanged.connect(lambda _text: self._search_timer.start())
         self.search_input.setStyleSheet(
             f"""
             QLineEdit {{
@@ -373,89 +559,74 @@ class KanbanWidget(QWidget):
         self.load_data()
 
     def load_data(self):
-        # 清空现有卡片
-        self.col_missing_change.clear_cards()
-        self.col_not_implemented.clear_cards()
-        
-        # 获取最新技术状态并筛选缺失项
-        query_sql = """
-            SELECT p.*,
-                ts.drawing_number, ts.drawing_version, ts.software_version, ts.firmware_version,
-                ts.req_baseline, ts.icd_version, ts.bom_version, ts.pcb_version,
-                ts.test_status, ts.qual_status, ts.change_order, ts.change_description
-            FROM product p
-            LEFT JOIN tech_status ts ON ts.id = (
-                SELECT id FROM tech_status
-                WHERE product_id = p.id
-                ORDER BY created_at DESC
-                LIMIT 1
-            )
-            WHERE p.status != 'inactive' OR p.lifecycle_state = 'obsolete'
-        """
-        conn = self.db.get_connection()
-        cursor = conn.cursor()
-        cursor.execute(query_sql)
-        products = [dict(row) for row in cursor.fetchall()]
-        conn.close()
-
-        status_map = {}
-        if products:
-            product_ids = [p["id"] for p in products]
-            placeholders = ",".join("?" for _ in product_ids)
-            status_sql = f"""
-                SELECT *
-                FROM tech_status
-                WHERE product_id IN ({placeholders})
-                ORDER BY created_at DESC
-            """
-            conn = self.db.get_connection()
-            cursor = conn.cursor()
-            cursor.execute(status_sql, product_ids)
-            for row in cursor.fetchall():
-                item = dict(row)
-                status_map.setdefault(item["product_id"], []).append(item)
-            conn.close()
-        
+        """刷新看板：查询与问题分类在后台线程执行，完成后再更新卡片"""
+        self._search_timer.stop()
+        self._load_generation += 1
+        # 中断仍在执行的旧查询；已查完的结果到达后也会因代数不符被丢弃
+        for worker in self._workers:
+            worker.cancel()
+
         search_text = ""
         if hasattr(self, "search_input"):
             search_text = self.search_input.text().strip().lower()
 
+        worker = KanbanLoadWorker(self.db, self.collect_board_data, self._load_generation, search_text, self)
+        worker.loaded.connect(self._apply_board_data)
+        worker.failed.connect(self._on_load_failed)
+        worker.finished.connect(lambda w=worker: self._on_worker_finished(w))
+        self._workers.append(worker)
+        worker.start()
+
+    def shutdown(self):
+        """停止后台加载与导入线程（窗口关闭时调用）"""
+        self.import_runner.shutdown()
+        self._search_timer.stop()
+        self._load_generation += 1
+        for worker in list(self._workers):
+            worker.cancel()
+            worker.wait()
+
+    def collect_board_data(self, search_text, is_cancelled):
+        """
+        查询并分类待处理产品（在工作线程中执行，不访问任何界面控件）
+
+        返回 {"missing_change": [...], "not_implemented": [...]}，取消时返回 None
+        """
+        if is_cancelled():
+            return None
+        # 问题标记在写入时已解析，这里只取有问题的产品
+        products = self.db.get_issue_products()
+        if search_text:
+            products = [p for p in products if self._matches_search(p, search_text)]
+        if is_cancelled():
+            return None
+
+        board = {"missing_change": [], "not_implemented": []}
         for p in products:
-            if search_text and not self._matches_search(p, search_text):
-                continue
-            issue_type, missing_fields = self._classify_issue_from_rows(
-                status_map.get(p["id"], [])
-            )
-            if not issue_type:
-                continue
-            if issue_type == "missing_change":
-                p["issue_type"] = "missing_change"
+            if p["issue_type"] == "missing_change":
                 p["issue_label"] = "缺失更改"
                 p["missing_prefix"] = "缺失"
-                p["missing_fields"] = missing_fields
-                self.col_missing_change.add_card(p)
-            elif issue_type == "not_implemented":
-                p["issue_type"] = "not_implemented"
+                board["missing_change"].append(p)
+            elif p["issue_type"] == "not_implemented":
                 p["issue_label"] = "未落实"
                 p["missing_prefix"] = "未落实"
-                p["missing_fields"] = missing_fields
-                self.col_not_implemented.add_card(p)
+                board["not_implemented"].append(p)
+        return board
 
-    def _extract_labeled_value(self, text, label):
-        if not text:
-            return ""
-        for part in text.split(";"):
-            part = part.strip()
-            if not part:
-                continue
-            if part.startswith(f"{label}:"):
-                return part[len(label) + 1:].strip()
-        return ""
+    def _apply_board_data(self, generation, board):
+        if generation != self._load_generation:
+            return  # 已有更新的查询，丢弃过期结果
+        self.col_missing_change.set_cards(board["missing_change"])
+        self.col_not_implemented.set_cards(board["not_implemented"])
 
-    def _is_effective(self, value):
-        if not value:
-            return False
-        return value.strip() not in {"——", "--", "-", "—"}
+    def _on_load_failed(self, generation, message):
+        if generation == self._load_generation:
+            QMessageBox.warning(self, "加载失败", f"看板数据加载失败:\n{message}")
+
+    def _on_worker_finished(self, worker):
+        if worker in self._workers:
+            self._workers.remove(worker)
+        worker.deleteLater()
 
     def _matches_search(self, data, keyword):
         fields = [
@@ -468,130 +639,5 @@ class KanbanWidget(QWidget):
         blob = " ".join(str(v) for v in fields if v)
         return keyword in blob.lower()
 
-    def _classify_issue(self, data):
-        change_order = data.get("change_order", "")
-        change_desc = data.get("change_description", "")
-        suggestion_order = self._extract_labeled_value(change_order, "更改建议单号")
-        doc_no = self._extract_labeled_value(change_order, "更改单号/技术通知单号/工艺更改单号")
-        suggestion_drawing = self._extract_labeled_value(change_desc, "更改建议单涉及图样/文件")
-        implement_status = self._extract_labeled_value(change_desc, "已落实情况")
-        missing_fields = []
-        if self._is_effective(suggestion_order):
-            if not self._is_effective(doc_no):
-                missing_fields.append("更改单号/技术通知单号/工艺更改单号")
-            if not self._is_effective(suggestion_drawing):
-                missing_fields.append("更改建议单涉及图样/文件")
-            if missing_fields:
-                return "missing_change", missing_fields
-        if self._is_effective(doc_no):
-            if not self._is_effective(implement_status) or implement_status.strip() != "已落实":
-                return "not_implemented", ["已落实情况"]
-        return None, []
-
-    def _classify_issue_from_rows(self, rows):
-        if not rows:
-            return None, []
-        missing_change_fields = set()
-        not_implemented = False
-        for row in rows:
-            issue_type, missing_fields = self._classify_issue(row)
-            if issue_type == "missing_change":
-                missing_change_fields.update(missing_fields)
-            elif issue_type == "not_implemented":
-                not_implemented = True
-
-        if missing_change_fields:
-            ordered = [
-                "更改单号/技术通知单号/工艺更改单号",
-                "更改建议单涉及图样/文件",
-            ]
-            missing_ordered = [name for name in ordered if name in missing_change_fields]
-            for name in missing_change_fields:
-                if name not in missing_ordered:
-                    missing_ordered.append(name)
-            return "missing_change", missing_ordered
-
-        if not_implemented:
-            return "not_implemented", ["已落实情况"]
-
-        return None, []
-
     def import_excel(self):
-        file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择Excel文件", "", "Excel Files (*.xlsx)"
-        )
-        if not file_path:
-            return
-
-        try:
-            parsed = self.importer.parse(file_path)
-        except Exception as exc:
-            QMessageBox.critical(self, "导入失败", f"解析Excel失败:\n{exc}")
-            return
-
-        rows = parsed["rows"]
-        if not rows:
-            QMessageBox.information(self, "导入提示", "未识别到有效数据行")
-            return
-
-        created_products = 0
-        updated_products = 0
-        inserted_status = 0
-        skipped_rows = 0
-        errors = []
-
-        for idx, row in enumerate(rows, 1):
-            product_code = row.get("product_code")
-            product_name = row.get("product_name") or product_code or "未命名"
-            batch_number = row.get("batch_number") or "未填写"
-            model = row.get("model") or "其他"
-
-            if not product_code:
-                skipped_rows += 1
-                errors.append(f"第{idx}行缺少产品代号")
-                continue
-
-            product = self.db.get_product_by_code(product_code)
-            if product:
-                if any([row.get("product_name"), row.get("batch_number"), row.get("model")]):
-                    self.db.update_product_basic(
-                        product["id"],
-                        {
-                            "product_name": product_name,
-                            "batch_number": batch_number,
-                            "model": model,
-                        },
-                    )
-                    updated_products += 1
-                product_id = product["id"]
-            else:
-                try:
-                    product_id = self.db.insert_product(
-                        {
-                            "product_code": product_code,
-                            "product_name": product_name,
-                            "batch_number": batch_number,
-                            "model": model,
-                            "status": "active",
-                        }
-                    )
-                    created_products += 1
-                except Exception as exc:
-                    skipped_rows += 1
-                    errors.append(f"第{idx}行产品创建失败: {exc}")
-                    continue
-
-            tech_status_id = self.db.insert_tech_status(product_id, row)
-            if row.get("change_order") or row.get("change_description"):
-                log_content = f"Excel导入更新 {product_code}"
-                self.db.insert_change_log(tech_status_id, "update", log_content)
-            inserted_status += 1
-
-        message = (
-            f"导入完成\n新增产品: {created_products}\n更新产品: {updated_products}"
-            f"\n新增技术状态: {inserted_status}\n跳过行数: {skipped_rows}"
-        )
-        if errors:
-            message += "\n\n错误示例:\n" + "\n".join(errors[:5])
-        QMessageBox.information(self, "导入结果", message)
-        self.load_data()
+        self.import_runner.choose_and_start()
@@ -131,6 +131,7 @@ class MainWindow(QMainWindow):
         self.kanban_page.card_clicked.connect(self.open_detail_dialog)
         self.entry_page.data_updated.connect(self.kanban_page.load_data)
         self.entry_page.data_updated.connect(self.report_page.refresh_data)
+        self.report_page.export_finished.connect(lambda message: self.status.showMessage(message, 10000))
 
         self.status = QStatusBar()
         self.setStatusBar(self.status)
@@ -199,7 +200,13 @@ class MainWindow(QMainWindow):
             QMessageBox.warning(self, "错误", "未找到该记录")
 
     def closeEvent(self, event):
-        """窗口关闭事件 - 执行自动备份"""
+        """窗口关闭事件 - 关闭数据库连接并执行自动备份"""
+        # 停止后台线程，再关闭所有页面共享的长连接，确保数据已落盘再备份
+        self.kanban_page.shutdown()
+        self.entry_page.shutdown()
+        self.report_page.shutdown()
+        self.settings_page.shutdown()
+        self.db.close()
         if self.backup_manager.config.get('auto_backup', True):
             try:
                 self.backup_manager.create_backup()
@@ -1,13 +1,17 @@
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLineEdit,
                              QPushButton, QTableWidget, QTableWidgetItem,
-                             QHeaderView, QMessageBox, QFileDialog)
+                             QHeaderView, QMessageBox, QFileDialog, QInputDialog)
 from PyQt5.QtCore import Qt
-from openpyxl import Workbook
 import os
 from db.database import DatabaseManager
 from ui.theme import THEME
 from ui.detail_dialog import DetailDialog
+from utils.excel_exporter import ExcelExporter
+
+# 查询结果每次加载的行数（滚动到底部时继续加载）
+PAGE_SIZE = 200
+
 
 class QueryWidget(QWidget):
     """状态查询界面"""
@@ -15,6 +19,10 @@ class QueryWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.db = DatabaseManager()
+        self.keyword = ""
+        self.page_cursor = None
+        self.ranked_ids = None
+        self.has_more = False
         self.init_ui()
 
     def init_ui(self):
@@ -30,8 +38,20 @@ class QueryWidget(QWidget):
         self.btn_search.setFixedWidth(100)
         self.btn_search.clicked.connect(self.perform_search)
         
+        self.btn_freeze = QPushButton("冻结基线")
+        self.btn_freeze.setFixedWidth(100)
+        self.btn_freeze.setObjectName("GhostButton")
+        self.btn_freeze.clicked.connect(self.freeze_baselines)
+        
         search_layout.addWidget(self.search_input)
         search_layout.addWidget(self.btn_search)
+        self.btn_diff = QPushButton("基线对比")
+        self.btn_diff.setFixedWidth(100)
+        self.btn_diff.setObjectName("GhostButton")
+        self.btn_diff.clicked.connect(self.export_baseline_diff)
+        
+        search_layout.addWidget(self.btn_freeze)
+        search_layout.addWidget(self.btn_diff)
         
         layout.addLayout(search_layout)
         
@@ -48,24 +68,70 @@ class QueryWidget(QWidget):
         
         self.table.setSelectionBehavior(QTableWidget.SelectRows)
         self.table.setEditTriggers(QTableWidget.NoEditTriggers)
+        self.table.verticalScrollBar().valueChanged.connect(self.on_scrolled)
         
         layout.addWidget(self.table)
         
         self.setLayout(layout)
 
     def perform_search(self):
-        """执行搜索"""
-        keyword = self.search_input.text().strip()
+        """执行搜索（先加载第一页，滚动到底部时继续加载）"""
+        self.has_more = False
+        self.table.setRowCount(0)
+        self.keyword = self.search_input.text().strip()
+        self.page_cursor = None
+        # 全文搜索按相关度排序：搜索时取一次 id 顺序，翻页时按位置读取
         try:
-            results = self.db.search_products(keyword)
-            self.load_table_data(results)
+            self.ranked_ids = self.db.search_ranked_ids(self.keyword)
         except Exception as e:
             QMessageBox.critical(self, "查询错误", str(e))
+            return
+        self.has_more = True
+        self.fetch_more()
+
+    def on_scrolled(self, value):
+        scroll_bar = self.table.verticalScrollBar()
+        if self.has_more and value >= scroll_bar.maximum() - 5:
+            self.fetch_more()
+
+    def fetch_more(self):
+        """加载下一页：全文搜索按相关度 id 列表的位置，其余按 (created_at, id) 键集"""
+        # 加载期间先置 has_more，避免追加行引起的滚动信号重复触发
+        self.has_more = False
+        try:
+            if self.ranked_ids is not None:
+                # 整页产品都已被删除时继续读下一页，避免表格不再滚动而停止加载
+                results = []
+                offset = self.page_cursor or 0
+                while not results and offset < len(self.ranked_ids):
+                    page_ids = self.ranked_ids[offset:offset + PAGE_SIZE]
+                    results = self.db.get_products_in_order(page_ids)
+                    offset += len(page_ids)
+            else:
+                results = self.db.search_products(self.keyword, page_size=PAGE_SIZE, after=self.page_cursor)
+        except Exception as e:
+            QMessageBox.critical(self, "查询错误", str(e))
+            return
+        if self.ranked_ids is not None:
+            self.page_cursor = offset
+            self.append_table_data(results)
+            self.has_more = offset < len(self.ranked_ids)
+            return
+        if results:
+            self.page_cursor = (results[-1]['created_at'], results[-1]['id'])
+            self.append_table_data(results)
+        self.has_more = len(results) == PAGE_SIZE
 
     def load_table_data(self, data):
         """加载数据到表格"""
-        self.table.setRowCount(len(data))
-        for row_idx, row_data in enumerate(data):
+        self.table.setRowCount(0)
+        self.append_table_data(data)
+
+    def append_table_data(self, data):
+        """追加数据到表格末尾"""
+        start = self.table.rowCount()
+        self.table.setRowCount(start + len(data))
+        for row_idx, row_data in enumerate(data, start):
             self.table.setItem(row_idx, 0, QTableWidgetItem(str(row_data['id'])))
             self.table.setItem(row_idx, 1, QTableWidgetItem(row_data['product_code']))
             self.table.setItem(row_idx, 2, QTableWidgetItem(row_data['product_name']))
@@ -107,6 +173,67 @@ class QueryWidget(QWidget):
             btn_layout.addWidget(btn_export)
             self.table.setCellWidget(row_idx, 5, btn_widget)
 
+    def freeze_baselines(self):
+        """按型号批量冻结基线（一个事务内为每个产品创建基线快照）"""
+        distribution = self.db.get_model_distribution()
+        if not distribution:
+            QMessageBox.warning(self, "提示", "没有可冻结的产品")
+            return
+        all_models = f"全部型号 ({sum(count for _, count in distribution)} 个产品)"
+        items = [all_models] + [f"{model} ({count} 个产品)" for model, count in distribution]
+        choice, ok = QInputDialog.getItem(self, "冻结基线", "选择型号:", items, 0, False)
+        if not ok:
+            return
+        model = None if choice == all_models else distribution[items.index(choice) - 1][0]
+        name, ok = QInputDialog.getText(self, "冻结基线", "请输入基线名称 (如: 生产基线 V1.0):")
+        if not ok or not name.strip():
+            return
+        try:
+            count = self.db.create_baselines(name.strip(), "Production", model_filter=model)
+            QMessageBox.information(self, "成功", f"已为 {count} 个产品创建基线快照")
+        except Exception as e:
+            QMessageBox.critical(self, "冻结失败", str(e))
+
+    def export_baseline_diff(self):
+        """批量对比两个基线（或基线与当前状态）并导出 Excel"""
+        names = self.db.get_baseline_names()
+        if not names:
+            QMessageBox.warning(self, "提示", "还没有创建任何基线")
+            return
+        labels = [f"{name} ({count} 个产品, {created_at})" for name, count, created_at in names]
+        choice, ok = QInputDialog.getItem(self, "基线对比", "基准基线:", labels, 0, False)
+        if not ok:
+            return
+        base_name = names[labels.index(choice)][0]
+
+        current = "当前状态"
+        targets = [current] + [label for label in labels if label != choice]
+        choice, ok = QInputDialog.getItem(self, "基线对比", "对比对象:", targets, 0, False)
+        if not ok:
+            return
+        other_name = None if choice == current else names[labels.index(choice)][0]
+
+        all_models = "全部型号"
+        models = [all_models] + [model for model, _ in self.db.get_model_distribution()]
+        choice, ok = QInputDialog.getItem(self, "基线对比", "型号范围:", models, 0, False)
+        if not ok:
+            return
+        model = None if choice == all_models else choice
+
+        file_path, _ = QFileDialog.getSaveFileName(self, "导出对比结果", "", "Excel Files (*.xlsx)")
+        if not file_path:
+            return
+        if not file_path.lower().endswith(".xlsx"):
+            file_path += ".xlsx"
+        try:
+            entries = self.db.diff_baseline_sets(base_name, other_name, model_filter=model)
+            ExcelExporter.export_baseline_diff(entries, file_path)
+            QMessageBox.information(
+                self, "成功", f"共 {len(entries)} 个产品存在差异，对比结果已导出到:\n{file_path}"
+            )
+        except Exception as e:
+            QMessageBox.critical(self, "对比失败", str(e))
+
     def view_detail(self, product_id):
         """查看详情"""
         data = self.db.get_product(product_id)
@@ -148,75 +275,7 @@ class QueryWidget(QWidget):
             file_path += ".xlsx"
 
         try:
-            wb = Workbook()
-            ws = wb.active
-            headers = self._export_headers()
-            row_values = self._build_export_row(product, tech_status)
-            ws.append(headers)
-            ws.append([row_values.get(header, "") for header in headers])
-            wb.save(file_path)
+            ExcelExporter.export_template_record(product, tech_status, file_path)
             QMessageBox.information(self, "导出成功", f"已导出: {file_path}")
         except Exception as exc:
             QMessageBox.critical(self, "导出失败", f"导出Excel失败:\n{exc}")
-
-    def _export_headers(self):
-        return [
-            "产品型号",
-            "所属机型",
-            "产品名称",
-            "所属阶段",
-            "协调单号",
-            "更改建议单号",
-            "更改理由",
-            "更改建议单涉及图样/文件",
-            "更改单号/技术通知单号/工艺更改单号",
-            "涉及更改图样",
-            "更改类别",
-            "更改原因",
-            "更改人",
-            "处理意见",
-            "需落实产品编号",
-            "已落实情况",
-            "未落实产品编号",
-            "工艺更改落实情况",
-            "备注",
-        ]
-
-    def _extract_labeled_value(self, text, label):
-        if not text:
-            return ""
-        for part in str(text).split(";"):
-            part = part.strip()
-            if part.startswith(f"{label}:"):
-                return part[len(label) + 1:].strip()
-        return ""
-
-    def _build_export_row(self, product, tech_status):
-        change_order = tech_status.get("change_order", "")
-        change_desc = tech_status.get("change_description", "")
-        values = {
-            "产品型号": product.get("product_code", ""),
-            "所属机型": product.get("model", ""),
-            "产品名称": product.get("product_name", ""),
-            "所属阶段": self._extract_labeled_value(change_desc, "所属阶段"),
-            "协调单号": self._extract_labeled_value(change_order, "协调单号"),
-            "更改建议单号": self._extract_labeled_value(change_order, "更改建议单号"),
-            "更改理由": self._extract_labeled_value(change_desc, "更改理由"),
-            "更改建议单涉及图样/文件": self._extract_labeled_value(change_desc, "更改建议单涉及图样/文件"),
-            "更改单号/技术通知单号/工艺更改单号": self._extract_labeled_value(
-                change_order, "更改单号/技术通知单号/工艺更改单号"
-            ),
-            "涉及更改图样": self._extract_labeled_value(change_desc, "涉及更改图样"),
-            "更改类别": self._extract_labeled_value(change_desc, "更改类别"),
-            "更改原因": self._extract_labeled_value(change_desc, "更改原因"),
-            "更改人": self._extract_labeled_value(change_desc, "更改人"),
-            "处理意见": self._extract_labeled_value(change_desc, "处理意见"),
-            "需落实产品编号": self._extract_labeled_value(change_desc, "需落实产品编号"),
-            "已落实情况": self._extract_labeled_value(change_desc, "已落实情况"),
-            "未落实产品编号": self._extract_labeled_value(change_desc, "未落实产品编号"),
-            "工艺更改落实情况": self._extract_labeled_value(change_desc, "工艺更改落实情况"),
-            "备注": self._extract_labeled_value(change_desc, "备注"),
-        }
-        if not values["更改单号/技术通知单号/工艺更改单号"] and change_order:
-            values["更改单号/技术通知单号/工艺更改单号"] = change_order
-        return values
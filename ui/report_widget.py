@@ -1,7 +1,8 @@
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
-                             QPushButton, QGroupBox, QListWidget, QMessageBox, QFileDialog)
-from PyQt5.QtCore import Qt
+                             QPushButton, QGroupBox, QListWidget, QMessageBox, QFileDialog,
+                             QProgressBar, QCheckBox, QDateEdit)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QDate
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib
@@ -26,14 +27,58 @@ matplotlib.use('Qt5Agg')
 
 from db.database import DatabaseManager
 from utils.excel_exporter import ExcelExporter
+from utils.csv_exporter import CsvExporter
+from utils.parquet_exporter import ParquetExporter
+
+class ExportCancelled(Exception):
+    """导出被用户取消"""
+
+
+class ExportWorker(QThread):
+    """后台导出线程：查询与写文件都不占用界面线程"""
+
+    progress = pyqtSignal(int)
+    completed = pyqtSignal(str, int)
+    failed = pyqtSignal(str)
+    cancelled = pyqtSignal()
+
+    def __init__(self, db, exporter, file_path, options, parent=None):
+        super().__init__(parent)
+        self.db = db
+        self.exporter = exporter
+        self.file_path = file_path
+        self.options = options
+
+    def _on_progress(self, count):
+        if self.isInterruptionRequested():
+            raise ExportCancelled()
+        self.progress.emit(count)
+
+    def run(self):
+        try:
+            count = self.exporter.export_query(
+                self.db, self.file_path, progress=self._on_progress, **self.options
+            )
+            self.completed.emit(self.file_path, count)
+        except ExportCancelled:
+            self.cancelled.emit()
+        except Exception as exc:
+            self.failed.emit(str(exc))
+        finally:
+            self.db.release_thread_connection()
+
 
 class ReportWidget(QWidget):
     """数据报表界面"""
+
+    # 导出完成后通知主窗口（参数为提示文本）
+    export_finished = pyqtSignal(str)
     
     def __init__(self):
         super().__init__()
         self.db = DatabaseManager()
         self._stat_labels = []
+        self.export_worker = None
         self.init_ui()
 
     def init_ui(self):
@@ -82,12 +127,36 @@ class ReportWidget(QWidget):
         self.btn_export.setObjectName("SuccessButton")
         self.btn_export.clicked.connect(self.export_all_data)
         
+        # 按日期导出：各产品在该日期生效的技术状态（按生效日期）
+        self.as_of_check = QCheckBox("导出指定日期的状态")
+        self.as_of_date = QDateEdit(QDate.currentDate())
+        self.as_of_date.setCalendarPopup(True)
+        self.as_of_date.setDisplayFormat("yyyy-MM-dd")
+        self.as_of_date.setEnabled(False)
+        self.as_of_check.toggled.connect(self.as_of_date.setEnabled)
+        
         self.btn_refresh = QPushButton("刷新")
         self.btn_refresh.setFixedSize(100, 40)
         self.btn_refresh.setObjectName("GhostButton")
         self.btn_refresh.clicked.connect(self.refresh_data)
         
+        # 导出进度（导出期间可切换到其他页面继续工作）
+        self.export_progress = QProgressBar()
+        self.export_progress.setFixedWidth(260)
+        self.export_progress.setFormat("导出中 %v / %m 行")
+        self.export_progress.hide()
+
+        self.btn_cancel_export = QPushButton("取消导出")
+        self.btn_cancel_export.setFixedSize(100, 40)
+        self.btn_cancel_export.setObjectName("GhostButton")
+        self.btn_cancel_export.clicked.connect(self.cancel_export)
+        self.btn_cancel_export.hide()
+
+        btn_layout.addWidget(self.export_progress)
+        btn_layout.addWidget(self.btn_cancel_export)
         btn_layout.addStretch()
+        btn_layout.addWidget(self.as_of_check)
+        btn_layout.addWidget(self.as_of_date)
         btn_layout.addWidget(self.btn_refresh)
         btn_layout.addWidget(self.btn_export)
         
@@ -181,92 +250,92 @@ class ReportWidget(QWidget):
         self.canvas.draw()
 
     def export_all_data(self):
-        """导出全部数据"""
+        """导出全部数据（Excel / CSV / Parquet），在后台线程执行"""
+        if self.export_worker is not None:
+            QMessageBox.information(self, "提示", "已有导出任务正在进行")
+            return
         try:
-            # 获取所有数据
-            data = self.db.get_products_with_tech_status()
-            
-            if not data:
+            if not self.db.count_products_with_tech_status():
                 QMessageBox.warning(self, "提示", "没有可导出的数据")
                 return
-            
-            # 选择保存位置
-            file_path, _ = QFileDialog.getSaveFileName(
-                self, "保存Excel文件", "", "Excel Files (*.xlsx)"
-            )
-            
-            if file_path:
-                if not file_path.endswith('.xlsx'):
-                    file_path += '.xlsx'
-                
-                # 导出
-                import os
-                output_dir = os.path.dirname(file_path)
-                filename = os.path.basename(file_path)
-                
-                # 临时修改导出器以使用指定文件名
-                from openpyxl import Workbook
-                from openpyxl.styles import Font, Alignment, PatternFill
-                
-                wb = Workbook()
-                ws = wb.active
-                ws.title = "技术状态数据"
-                
-                headers = [
-                    "ID", "产品代号", "产品名称", "批次编号", "所属型号",
-                    "图号", "图纸版本", "软件版本", "固件版本", "硬件配置",
-                    "需求基线", "接口基线", "BOM版本", "PCB版本", "硬件序列号",
-                    "生产批次", "测试状态", "合格状态",
-                    "更改单号", "更改内容", "生效日期", "状态", "创建时间"
-                ]
-                
-                for col_num, header in enumerate(headers, 1):
-                    cell = ws.cell(row=1, column=col_num, value=header)
-                    cell.font = Font(bold=True, color="FFFFFF")
-                    cell.fill = PatternFill(start_color="E07A5F", end_color="E07A5F", fill_type="solid")
-                    cell.alignment = Alignment(horizontal="center", vertical="center")
-                
-                for row_num, item in enumerate(data, 2):
-                    ws.cell(row=row_num, column=1, value=item.get('id', ''))
-                    ws.cell(row=row_num, column=2, value=item.get('product_code', ''))
-                    ws.cell(row=row_num, column=3, value=item.get('product_name', ''))
-                    ws.cell(row=row_num, column=4, value=item.get('batch_number', ''))
-                    ws.cell(row=row_num, column=5, value=item.get('model', ''))
-                    ws.cell(row=row_num, column=6, value=item.get('drawing_number', ''))
-                    ws.cell(row=row_num, column=7, value=item.get('drawing_version', ''))
-                    ws.cell(row=row_num, column=8, value=item.get('software_version', ''))
-                    ws.cell(row=row_num, column=9, value=item.get('firmware_version', ''))
-                    ws.cell(row=row_num, column=10, value=item.get('hardware_config', ''))
-                    ws.cell(row=row_num, column=11, value=item.get('req_baseline', ''))
-                    ws.cell(row=row_num, column=12, value=item.get('icd_version', ''))
-                    ws.cell(row=row_num, column=13, value=item.get('bom_version', ''))
-                    ws.cell(row=row_num, column=14, value=item.get('pcb_version', ''))
-                    ws.cell(row=row_num, column=15, value=item.get('hw_serial', ''))
-                    ws.cell(row=row_num, column=16, value=item.get('production_batch', ''))
-                    ws.cell(row=row_num, column=17, value=item.get('test_status', ''))
-                    ws.cell(row=row_num, column=18, value=item.get('qual_status', ''))
-                    ws.cell(row=row_num, column=19, value=item.get('change_order', ''))
-                    ws.cell(row=row_num, column=20, value=item.get('change_description', ''))
-                    ws.cell(row=row_num, column=21, value=item.get('effective_date', ''))
-                    status_text = "草稿" if item.get('status') == 'draft' else "正式"
-                    ws.cell(row=row_num, column=22, value=status_text)
-                    ws.cell(row=row_num, column=23, value=item.get('created_at', ''))
-                
-                for column in ws.columns:
-                    max_length = 0
-                    column_letter = column[0].column_letter
-                    for cell in column:
-                        try:
-                            if len(str(cell.value)) > max_length:
-                                max_length = len(str(cell.value))
-                        except:
-                            pass
-                    adjusted_width = min(max_length + 2, 50)
-                    ws.column_dimensions[column_letter].width = adjusted_width
-                
-                wb.save(file_path)
-                
-                QMessageBox.information(self, "成功", f"数据已导出到:\n{file_path}")
-                
         except Exception as e:
             QMessageBox.critical(self, "导出失败", f"导出过程中发生错误:\n{str(e)}")
+            return
+
+        # 选择保存位置
+        filters = ["Excel Files (*.xlsx)", "CSV Files (*.csv)"]
+        if ParquetExporter.is_available():
+            filters.append("Parquet Files (*.parquet)")
+        file_path, selected = QFileDialog.getSaveFileName(
+            self, "导出数据", "", ";;".join(filters)
+        )
+        if not file_path:
+            return
+
+        ext = selected[selected.index("*") + 1:-1] if selected else ".xlsx"
+        if not file_path.lower().endswith(ext):
+            file_path += ext
+
+        options = {}
+        if self.as_of_check.isChecked():
+            options["as_of"] = self.as_of_date.date().toString("yyyy-MM-dd")
+        if ext == ".xlsx":
+            exporter = ExcelExporter
+        else:
+            if not options:
+                options["history"] = QMessageBox.question(
+                    self, "导出范围", "是否导出全部历史技术状态？\n选择“否”仅导出最新状态。",
+                    QMessageBox.Yes | QMessageBox.No, QMessageBox.No
+                ) == QMessageBox.Yes
+            exporter = CsvExporter if ext == ".csv" else ParquetExporter
+        total = self.db.count_products_with_tech_status(**options)
+        if not total:
+            QMessageBox.warning(
+                self, "提示", "所选日期尚无生效的技术状态" if "as_of" in options else "没有可导出的数据"
+            )
+            return
+
+        self.export_progress.setRange(0, max(total, 1))
+        self.export_progress.setValue(0)
+        self.export_progress.show()
+        self.btn_cancel_export.setEnabled(True)
+        self.btn_cancel_export.show()
+        self.btn_export.setEnabled(False)
+
+        # 从数据库游标流式写出，不在内存中构建整张表
+        self.export_worker = ExportWorker(self.db, exporter, file_path, options, self)
+        self.export_worker.progress.connect(self.export_progress.setValue)
+        self.export_worker.completed.connect(self._on_export_completed)
+        self.export_worker.failed.connect(self._on_export_failed)
+        self.export_worker.cancelled.connect(self._on_export_cancelled)
+        self.export_worker.finished.connect(self._on_export_worker_finished)
+        self.export_worker.start()
+
+    def cancel_export(self):
+        if self.export_worker is not None:
+            self.export_worker.requestInterruption()
+            self.btn_cancel_export.setEnabled(False)
+
+    def shutdown(self):
+        """停止后台导出线程（窗口关闭时调用）"""
+        if self.export_worker is not None:
+            self.export_worker.requestInterruption()
+            self.export_worker.wait()
+
+    def _on_export_completed(self, file_path, count):
+        self.export_finished.emit(f"数据导出完成（{count} 行）: {file_path}")
+        QMessageBox.information(self, "成功", f"已导出 {count} 行数据到:\n{file_path}")
+
+    def _on_export_failed(self, message):
+        self.export_finished.emit("数据导出失败")
+        QMessageBox.critical(self, "导出失败", f"导出过程中发生错误:\n{message}")
+
+    def _on_export_cancelled(self):
+        self.export_finished.emit("数据导出已取消")
+
+    def _on_export_worker_finished(self):
+        self.export_worker.deleteLater()
+        self.export_worker = None
+        self.export_progress.hide()
+        self.btn_cancel_export.hide()
+        self.btn_export.setEnabled(True)
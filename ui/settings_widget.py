@@ -1,11 +1,43 @@
 # -*- coding: utf-8 -*-
 from PyQt5.QtWidgets import (QWidget, QVBoxLayout, QHBoxLayout, QLabel, 
                              QPushButton, QGroupBox, QCheckBox, QSpinBox,
-                             QLineEdit, QFileDialog, QMessageBox, QFormLayout, QListWidget)
-from PyQt5.QtCore import Qt, pyqtSignal, QSignalBlocker
+                             QLineEdit, QFileDialog, QMessageBox, QFormLayout, QListWidget,
+                             QProgressBar)
+from PyQt5.QtCore import Qt, QThread, pyqtSignal, QSignalBlocker
 from utils.backup import BackupManager
 import os
 
+
+class BackupCancelled(Exception):
+    """备份被中止（窗口关闭）"""
+
+
+class BackupWorker(QThread):
+    """后台备份线程：在线备份期间界面和数据库均可正常使用"""
+
+    progress = pyqtSignal(int, int)
+    completed = pyqtSignal(str)
+    failed = pyqtSignal(str)
+
+    def __init__(self, backup_manager, parent=None):
+        super().__init__(parent)
+        self.backup_manager = backup_manager
+
+    def _on_progress(self, done, total):
+        if self.isInterruptionRequested():
+            raise BackupCancelled()
+        self.progress.emit(done, total)
+
+    def run(self):
+        try:
+            backup_path = self.backup_manager.create_backup(progress=self._on_progress)
+            self.completed.emit(backup_path)
+        except BackupCancelled:
+            pass
+        except Exception as exc:
+            self.failed.emit(str(exc))
+
+
 class SettingsWidget(QWidget):
     font_scale_changed = pyqtSignal(float)
     """系统设置界面"""
@@ -13,6 +45,7 @@ class SettingsWidget(QWidget):
     def __init__(self):
         super().__init__()
         self.backup_manager = BackupManager()
+        self.backup_worker = None
         self.init_ui()
 
     def init_ui(self):
@@ -83,6 +116,12 @@ class SettingsWidget(QWidget):
         
         btn_layout.addWidget(self.btn_backup_now)
         btn_layout.addWidget(self.btn_restore)
+
+        self.backup_progress = QProgressBar()
+        self.backup_progress.setFixedWidth(220)
+        self.backup_progress.setFormat("备份中 %p%")
+        self.backup_progress.hide()
+        btn_layout.addWidget(self.backup_progress)
         btn_layout.addStretch()
         
         operations_layout.addLayout(btn_layout)
@@ -112,13 +151,15 @@ class SettingsWidget(QWidget):
 
     def save_settings(self):
         """保存设置"""
-        config = {
+        # 保留界面上未展示的配置项（如 storage_profile）
+        config = dict(self.backup_manager.config)
+        config.update({
             'auto_backup': self.auto_backup_check.isChecked(),
             'backup_dir': self.backup_dir_edit.text(),
             'backup_keep_days': self.keep_days_spin.value(),
             'db_path': self.backup_manager.config.get('db_path', 'tsm_data.db'),
             'ui_font_scale': self.font_scale_spin.value() / 100.0,
-        }
+        })
         self.backup_manager.save_config(config)
 
     def on_font_scale_changed(self, _value):
@@ -137,20 +178,51 @@ class SettingsWidget(QWidget):
             self.save_settings()
 
     def backup_now(self):
-        """立即备份"""
-        try:
-            backup_path = self.backup_manager.create_backup()
-            QMessageBox.information(self, "成功", f"备份已创建:\n{backup_path}")
-            self.refresh_backup_list()
-        except Exception as e:
-            QMessageBox.critical(self, "备份失败", f"备份过程中发生错误:\n{str(e)}")
+        """立即备份（后台线程执行）"""
+        if self.backup_worker is not None:
+            return
+        self.btn_backup_now.setEnabled(False)
+        self.btn_restore.setEnabled(False)
+        self.backup_progress.setRange(0, 0)
+        self.backup_progress.show()
+
+        self.backup_worker = BackupWorker(self.backup_manager, self)
+        self.backup_worker.progress.connect(self._on_backup_progress)
+        self.backup_worker.completed.connect(self._on_backup_completed)
+        self.backup_worker.failed.connect(self._on_backup_failed)
+        self.backup_worker.finished.connect(self._on_backup_worker_finished)
+        self.backup_worker.start()
+
+    def shutdown(self):
+        """中止后台备份（窗口关闭时调用，未完成的临时文件会被删除）"""
+        if self.backup_worker is not None:
+            self.backup_worker.requestInterruption()
+            self.backup_worker.wait()
+
+    def _on_backup_progress(self, done, total):
+        self.backup_progress.setRange(0, max(total, 1))
+        self.backup_progress.setValue(done)
+
+    def _on_backup_completed(self, backup_path):
+        QMessageBox.information(self, "成功", f"备份已创建:\n{backup_path}")
+
+    def _on_backup_failed(self, message):
+        QMessageBox.critical(self, "备份失败", f"备份过程中发生错误:\n{message}")
+
+    def _on_backup_worker_finished(self):
+        self.backup_worker.deleteLater()
+        self.backup_worker = None
+        self.backup_progress.hide()
+        self.btn_backup_now.setEnabled(True)
+        self.btn_restore.setEnabled(True)
+        self.refresh_backup_list()
 
     def restore_backup(self):
         """恢复备份"""
         # 选择备份文件
         backup_dir = self.backup_manager.config.get('backup_dir', './backups')
         file_path, _ = QFileDialog.getOpenFileName(
-            self, "选择备份文件", backup_dir, "Database Files (*.db)"
+            self, "选择备份文件", backup_dir, "Backup Files (*.json *.db)"
         )
         
         if file_path:
@@ -173,5 +245,11 @@ class SettingsWidget(QWidget):
         backups = self.backup_manager.list_backups()
         for backup in backups:
             size_mb = backup['size'] / (1024 * 1024)
-            item_text = f"{backup['filename']} ({size_mb:.2f} MB) - {backup['mtime'].strftime('%Y-%m-%d %H:%M:%S')}"
+            if backup['kind'] == 'chunked':
+                stored_mb = backup['stored_size'] / (1024 * 1024)
+                kind = "增量" if backup['parent'] else "完整"
+                size_text = f"{kind}，{size_mb:.2f} MB，新增占用 {stored_mb:.2f} MB"
+            else:
+                size_text = f"{size_mb:.2f} MB"
+            item_text = f"{backup['filename']} ({size_text}) - {backup['mtime'].strftime('%Y-%m-%d %H:%M:%S')}"
             self.backup_list.addItem(item_text)
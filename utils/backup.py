@@ -1,9 +1,21 @@
 # -*- coding: utf-8 -*-
 import os
-import shutil
+import sqlite3
 from datetime import datetime, timedelta
 import json
 
+from utils.backup_store import ChunkStore, chunk_hash, CHUNK_SIZE
+
+# 在线备份每批复制的页数（默认页大小 4KB 时约 4MB）
+BACKUP_PAGES_PER_STEP = 1024
+# 源库被占用时重试前的等待秒数
+BACKUP_STEP_SLEEP = 0.05
+
+BACKUP_PREFIX = 'tsm_data_backup_'
+# 块存储目录（位于备份目录下）
+CHUNK_DIR = 'chunks'
+MANIFEST_VERSION = 1
+
 class BackupManager:
     """数据库备份管理器"""
     
@@ -19,14 +31,30 @@ class BackupManager:
             "backup_keep_days": 7,
             "db_path": "tsm_data.db",
             "ui_font_scale": 1.0,
+            # SQLite 存储参数（WAL + 调优 PRAGMA）
+            "storage_profile": {
+                "journal_mode": "WAL",
+                "synchronous": "NORMAL",
+                "cache_size": -65536,           # 负数表示 KiB，约 64MB
+                "mmap_size": 268435456,         # 256MB
+                "temp_store": "MEMORY",
+                "busy_timeout": 5000,
+                "wal_autocheckpoint": 1000,     # 页数
+                "journal_size_limit": 67108864,  # checkpoint 后 WAL 截断上限 64MB
+                "checkpoint_after_rows": 20000,  # 批量导入超过该行数后执行 TRUNCATE checkpoint
+            },
         }
         
         if os.path.exists(self.config_file):
             try:
                 with open(self.config_file, 'r', encoding='utf-8') as f:
                     config = json.load(f)
-                    # 合并默认配置
-                    return {**default_config, **config}
+                    # 合并默认配置（storage_profile 按键合并）
+                    storage_profile = {
+                        **default_config["storage_profile"],
+                        **config.get("storage_profile", {}),
+                    }
+                    return {**default_config, **config, "storage_profile": storage_profile}
             except:
                 return default_config
         else:
@@ -38,8 +66,16 @@ class BackupManager:
             json.dump(config, f, indent=2, ensure_ascii=False)
         self.config = config
     
-    def create_backup(self, db_path=None, backup_dir=None):
-        """创建备份"""
+    def create_backup(self, db_path=None, backup_dir=None, progress=None):
+        """
+        创建备份（差异备份）
+
+        先用 SQLite 在线备份接口复制出一致的快照（WAL 模式下备份期间程序仍可正常读写），
+        完整性检查通过后按 CHUNK_SIZE 切块，只压缩写入块存储中还没有的块，
+        最后写出记录全部块哈希的清单文件。每份清单都可以独立恢复出完整数据库。
+        progress: 可选回调，以 (已完成量, 总量) 调用；回调抛出异常时中止备份
+        返回清单文件路径
+        """
         if db_path is None:
             db_path = self.config.get('db_path', 'tsm_data.db')
         
@@ -55,19 +91,122 @@ class BackupManager:
         
         # 生成备份文件名
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        backup_filename = f"tsm_data_backup_{timestamp}.db"
-        backup_path = os.path.join(backup_dir, backup_filename)
+        manifest_path = os.path.join(backup_dir, f"{BACKUP_PREFIX}{timestamp}.json")
+        snapshot_path = os.path.join(backup_dir, f"snapshot_{timestamp}.tmp")
         
-        # 复制数据库文件
-        shutil.copy2(db_path, backup_path)
+        # 进度分两段：复制快照、切块入库，各占一半
+        def copy_progress(done, total):
+            if progress:
+                progress(done, total * 2)
+
+        try:
+            self._copy_database(db_path, snapshot_path, copy_progress)
+            parent = self._latest_manifest(backup_dir)
+            manifest = self._store_snapshot(snapshot_path, backup_dir, parent, progress)
+            manifest['source'] = os.path.basename(db_path)
+            self._write_json(manifest_path, manifest)
+        finally:
+            if os.path.exists(snapshot_path):
+                os.remove(snapshot_path)
         
         # 清理旧备份
         self.cleanup_old_backups(backup_dir)
         
-        return backup_path
+        return manifest_path
+    
+    def _copy_database(self, db_path, target_path, progress=None):
+        """用在线备份接口复制数据库并校验副本"""
+        def on_step(_status, remaining, total):
+            if progress:
+                progress(total - remaining, total)
+
+        src = sqlite3.connect(db_path)
+        try:
+            wal = src.execute("PRAGMA journal_mode").fetchone()[0].lower() == 'wal'
+            if wal:
+                # WAL 模式下全程持有一个读事务：各批次读取同一快照，
+                # 其他连接的写入不会让备份从头重来，也不会被阻塞
+                src.execute("BEGIN")
+                src.execute("SELECT COUNT(*) FROM sqlite_master").fetchone()
+            dst = sqlite3.connect(target_path)
+            try:
+                src.backup(dst, pages=BACKUP_PAGES_PER_STEP, progress=on_step, sleep=BACKUP_STEP_SLEEP)
+                # 副本改为独立的单文件（不依赖 -wal 文件）
+                dst.execute("PRAGMA journal_mode=DELETE")
+                result = dst.execute("PRAGMA integrity_check").fetchone()[0]
+                if result != 'ok':
+                    raise RuntimeError(f"备份完整性检查失败: {result}")
+            finally:
+                dst.close()
+        finally:
+            src.close()
+    
+    def _store_snapshot(self, snapshot_path, backup_dir, parent=None, progress=None):
+        """把快照文件切块写入块存储，返回清单内容"""
+        store = ChunkStore(os.path.join(backup_dir, CHUNK_DIR))
+        # 上一份备份引用的块必然已在存储中，免去逐个检查文件
+        known = set(parent['chunks']) if parent else set()
+        size = os.path.getsize(snapshot_path)
+        chunks = []
+        new_chunks = 0
+        stored_bytes = 0
+        done = 0
+        with open(snapshot_path, 'rb') as handle:
+            while True:
+                data = handle.read(CHUNK_SIZE)
+                if not data:
+                    break
+                digest = chunk_hash(data)
+                if digest not in known:
+                    written = store.put(digest, data)
+                    if written:
+                        new_chunks += 1
+                        stored_bytes += written
+                    known.add(digest)
+                chunks.append(digest)
+                done += len(data)
+                if progress:
+                    progress(size + done, size * 2)
+        return {
+            'version': MANIFEST_VERSION,
+            'created_at': datetime.now().isoformat(timespec='seconds'),
+            'parent': parent['filename'] if parent else None,
+            'size': size,
+            'chunk_size': CHUNK_SIZE,
+            'chunks': chunks,
+            'new_chunks': new_chunks,
+            'stored_bytes': stored_bytes,
+        }
+    
+    def _latest_manifest(self, backup_dir):
+        """返回最近一份差异备份的清单（附带 filename），没有时返回 None"""
+        for backup in self.list_backups(backup_dir):
+            if backup['kind'] == 'chunked':
+                manifest = self._read_json(backup['filepath'])
+                manifest['filename'] = backup['filename']
+                return manifest
+        return None
+    
+    @staticmethod
+    def _read_json(path):
+        with open(path, 'r', encoding='utf-8') as f:
+            return json.load(f)
+    
+    @staticmethod
+    def _write_json(path, data):
+        tmp_path = path + '.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump(data, f)
+        os.replace(tmp_path, path)
     
     def list_backups(self, backup_dir=None):
-        """列出所有备份文件"""
+        """
+        列出所有备份
+
+        包括差异备份清单（.json，kind 为 chunked）和旧版完整备份（.db，kind 为 full）。
+        size 为数据库大小，stored_size 为该备份新增占用的磁盘空间，
+        parent 为差异备份所基于的上一份备份
+        """
         if backup_dir is None:
             backup_dir = self.config.get('backup_dir', './backups')
         
@@ -76,13 +215,34 @@ class BackupManager:
         
         backups = []
         for filename in os.listdir(backup_dir):
-            if filename.startswith('tsm_data_backup_') and filename.endswith('.db'):
-                filepath = os.path.join(backup_dir, filename)
-                stat = os.stat(filepath)
+            if not filename.startswith(BACKUP_PREFIX):
+                continue
+            filepath = os.path.join(backup_dir, filename)
+            stat = os.stat(filepath)
+            if filename.endswith('.json'):
+                try:
+                    manifest = self._read_json(filepath)
+                except (OSError, ValueError):
+                    continue
+                backups.append({
+                    'filename': filename,
+                    'filepath': filepath,
+                    'kind': 'chunked',
+                    'size': manifest.get('size', 0),
+                    'stored_size': manifest.get('stored_bytes', 0),
+                    'parent': manifest.get('parent'),
+                    'chunks': manifest.get('chunks', []),
+                    'mtime': datetime.fromtimestamp(stat.st_mtime)
+                })
+            elif filename.endswith('.db'):
                 backups.append({
                     'filename': filename,
                     'filepath': filepath,
+                    'kind': 'full',
                     'size': stat.st_size,
+                    'stored_size': stat.st_size,
+                    'parent': None,
+                    'chunks': [],
                     'mtime': datetime.fromtimestamp(stat.st_mtime)
                 })
         
@@ -91,33 +251,66 @@ class BackupManager:
         return backups
     
     def restore_backup(self, backup_file, db_path=None):
-        """从备份恢复"""
+        """
+        从备份恢复
+
+        backup_file 可以是差异备份清单（.json）或完整备份（.db）。
+        清单先由块存储重建为临时数据库并做完整性检查；
+        再通过在线备份接口整体写入当前数据库，写入在一个事务内完成，失败时原数据不变。
+        """
         if db_path is None:
             db_path = self.config.get('db_path', 'tsm_data.db')
         
         if not os.path.exists(backup_file):
             raise FileNotFoundError(f"备份文件不存在: {backup_file}")
         
-        # 备份当前数据库（以防恢复失败）
-        if os.path.exists(db_path):
-            temp_backup = db_path + '.before_restore'
-            shutil.copy2(db_path, temp_backup)
+        source_path = backup_file
+        rebuilt_path = None
+        if backup_file.endswith('.json'):
+            rebuilt_path = db_path + '.restore.tmp'
+            source_path = rebuilt_path
         
         try:
-            # 恢复备份
-            shutil.copy2(backup_file, db_path)
-            # 删除临时备份
-            if os.path.exists(db_path + '.before_restore'):
-                os.remove(db_path + '.before_restore')
-        except Exception as e:
-            # 恢复失败，还原原数据库
-            if os.path.exists(db_path + '.before_restore'):
-                shutil.copy2(db_path + '.before_restore', db_path)
-                os.remove(db_path + '.before_restore')
-            raise e
+            if rebuilt_path:
+                self._rebuild_snapshot(backup_file, rebuilt_path)
+            src = sqlite3.connect(source_path)
+            try:
+                dst = sqlite3.connect(db_path)
+                try:
+                    src.backup(dst)
+                finally:
+                    dst.close()
+            finally:
+                src.close()
+        finally:
+            if rebuilt_path and os.path.exists(rebuilt_path):
+                os.remove(rebuilt_path)
     
+    def _rebuild_snapshot(self, manifest_path, target_path):
+        """按清单从块存储拼出数据库文件并校验"""
+        manifest = self._read_json(manifest_path)
+        store = ChunkStore(os.path.join(os.path.dirname(manifest_path), CHUNK_DIR))
+        with open(target_path, 'wb') as handle:
+            for digest in manifest['chunks']:
+                handle.write(store.get(digest))
+        if os.path.getsize(target_path) != manifest['size']:
+            raise RuntimeError("备份数据大小与清单不符")
+        conn = sqlite3.connect(target_path)
+        try:
+            result = conn.execute("PRAGMA integrity_check").fetchone()[0]
+        finally:
+            conn.close()
+        if result != 'ok':
+            raise RuntimeError(f"备份完整性检查失败: {result}")
+
     def cleanup_old_backups(self, backup_dir=None):
-        """清理过期备份"""
+        """
+        清理过期备份
+
+        删除超过保留天数的清单和完整备份（始终保留最新一份），
+        再回收不被任何剩余清单引用的数据块。
+        每份清单都记录完整的块列表，删除链上较早的备份不影响后续备份的恢复。
+        """
         if backup_dir is None:
             backup_dir = self.config.get('backup_dir', './backups')
         
@@ -125,9 +318,17 @@ class BackupManager:
         cutoff_date = datetime.now() - timedelta(days=keep_days)
         
         backups = self.list_backups(backup_dir)
-        for backup in backups:
+        removed = False
+        for backup in backups[1:]:
             if backup['mtime'] < cutoff_date:
                 try:
                     os.remove(backup['filepath'])
+                    removed = True
                 except:
                     pass
+        
+        if removed:
+            referenced = set()
+            for backup in self.list_backups(backup_dir):
+                referenced.update(backup['chunks'])
+            ChunkStore(os.path.join(backup_dir, CHUNK_DIR)).sweep(referenced)
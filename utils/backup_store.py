@@ -0,0 +1,109 @@
+# -*- coding: utf-8 -*-
+import gzip
+import hashlib
+import os
+
+# zstandard 为可选依赖，未安装时块文件使用 gzip 压缩
+try:
+    import zstandard as zstd
+except ImportError:
+    zstd = None
+
+# 每个块的字节数，为 SQLite 各种页大小（最大 64KB）的整数倍
+CHUNK_SIZE = 256 * 1024
+
+# 块文件扩展名 -> 压缩方式
+CODEC_EXTENSIONS = (".zst", ".gz")
+
+
+def chunk_hash(data):
+    """块内容的地址（未压缩内容的 SHA-256）"""
+    return hashlib.sha256(data).hexdigest()
+
+
+class ChunkStore:
+    """
+    按内容寻址的块存储
+
+    块文件保存在 root/<哈希前两位>/<哈希>.zst（或 .gz），相同内容只保存一份。
+    读取时按扩展名解压，因此安装或卸载 zstandard 前后写入的块可以混用。
+    """
+
+    def __init__(self, root):
+        self.root = root
+
+    def _path(self, digest, ext):
+        return os.path.join(self.root, digest[:2], digest + ext)
+
+    def find(self, digest):
+        """返回块文件路径，不存在时返回 None"""
+        for ext in CODEC_EXTENSIONS:
+            path = self._path(digest, ext)
+            if os.path.exists(path):
+                return path
+        return None
+
+    def put(self, digest, data):
+        """
+        写入一个块（已存在时跳过）
+
+        返回写入磁盘的压缩后字节数，已存在时返回 0
+        """
+        if self.find(digest):
+            return 0
+        if zstd is not None:
+            ext, payload = ".zst", zstd.ZstdCompressor(level=3).compress(data)
+        else:
+            ext, payload = ".gz", gzip.compress(data, compresslevel=6)
+        path = self._path(digest, ext)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "wb") as handle:
+            handle.write(payload)
+        os.replace(tmp_path, path)
+        return len(payload)
+
+    def get(self, digest):
+        """读取并解压一个块，内容与哈希不符时抛出异常"""
+        path = self.find(digest)
+        if path is None:
+            raise FileNotFoundError(f"备份数据块缺失: {digest}")
+        with open(path, "rb") as handle:
+            payload = handle.read()
+        if path.endswith(".zst"):
+            if zstd is None:
+                raise RuntimeError("该备份使用 zstd 压缩，请先安装 zstandard")
+            data = zstd.ZstdDecompressor().decompress(payload)
+        else:
+            data = gzip.decompress(payload)
+        if chunk_hash(data) != digest:
+            raise RuntimeError(f"备份数据块已损坏: {digest}")
+        return data
+
+    def iter_chunks(self, include_partial=False):
+        """遍历存储中的全部块，产出 (哈希, 文件路径)；include_partial 时包含 .tmp 文件"""
+        if not os.path.isdir(self.root):
+            return
+        for prefix in os.listdir(self.root):
+            folder = os.path.join(self.root, prefix)
+            if not os.path.isdir(folder):
+                continue
+            for filename in os.listdir(folder):
+                digest, ext = os.path.splitext(filename)
+                if ext == ".tmp" and include_partial:
+                    yield digest, os.path.join(folder, filename)
+                elif ext in CODEC_EXTENSIONS:
+                    yield digest, os.path.join(folder, filename)
+
+    def sweep(self, referenced):
+        """删除不再被任何备份引用的块（及中断写入留下的临时文件），返回释放的字节数"""
+        freed = 0
+        for digest, path in list(self.iter_chunks(include_partial=True)):
+            if digest in referenced and not path.endswith(".tmp"):
+                continue
+            try:
+                freed += os.path.getsize(path)
+                os.remove(path)
+            except OSError:
+                pass
+        return freed
@@ -0,0 +1,35 @@
+# -*- coding: utf-8 -*-
+import csv
+import os
+
+from db.database import export_columns
+
+
+class CsvExporter:
+    """CSV 导出工具类（UTF-8，逐批写出，适合下游数据分析）"""
+
+    @staticmethod
+    def export_query(db, file_path, history=False, progress=None, **filters):
+        """
+        按 get_products_with_tech_status 的筛选条件流式导出 CSV
+
+        history 为 True 时导出全部历史技术状态。表头为字段名，值为数据库原值。
+        先写临时文件再替换，导出中途失败或 progress 回调抛出异常时不会留下不完整的文件。
+        返回导出行数
+        """
+        tmp_path = file_path + ".tmp"
+        count = 0
+        try:
+            with open(tmp_path, "w", encoding="utf-8", newline="") as handle:
+                writer = csv.writer(handle)
+                writer.writerow(export_columns(history))
+                for rows in db.iter_export_batches(history=history, **filters):
+                    writer.writerows(rows)
+                    count += len(rows)
+                    if progress:
+                        progress(count)
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return count
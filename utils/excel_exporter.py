@@ -1,86 +1,227 @@
 # -*- coding: utf-8 -*-
 from openpyxl import Workbook
+from openpyxl.cell import WriteOnlyCell
 from openpyxl.styles import Font, Alignment, PatternFill
+from openpyxl.utils import get_column_letter
 from datetime import datetime
+import itertools
 import os
 
+from db.issues import extract_labeled_value, LABEL_DOC_NO
+
+# 数据导出列定义：(字段, 表头)，报表导出与 ExcelExporter 共用
+EXPORT_COLUMNS = [
+    ("id", "ID"),
+    ("product_code", "产品代号"),
+    ("product_name", "产品名称"),
+    ("batch_number", "批次编号"),
+    ("model", "所属型号"),
+    ("drawing_number", "图号"),
+    ("drawing_version", "图纸版本"),
+    ("software_version", "软件版本"),
+    ("firmware_version", "固件版本"),
+    ("hardware_config", "硬件配置"),
+    ("req_baseline", "需求基线"),
+    ("icd_version", "接口基线"),
+    ("bom_version", "BOM版本"),
+    ("pcb_version", "PCB版本"),
+    ("hw_serial", "硬件序列号"),
+    ("production_batch", "生产批次"),
+    ("test_status", "测试状态"),
+    ("qual_status", "合格状态"),
+    ("change_order", "更改单号"),
+    ("change_description", "更改内容"),
+    ("effective_date", "生效日期"),
+    ("status", "状态"),
+    ("created_at", "创建时间"),
+]
+
+STATUS_TEXT = {"draft": "草稿", "active": "正式", "inactive": "已删除"}
+
+# 单条记录模板导出的表头（与导入模板一致，可直接再导入）
+# 取值来源：产品字段名，或 (技术状态字段, 标签) 表示从带标签文本中提取
+TEMPLATE_COLUMNS = [
+    ("产品型号", "product_code"),
+    ("所属机型", "model"),
+    ("产品名称", "product_name"),
+    ("所属阶段", ("change_description", "所属阶段")),
+    ("协调单号", ("change_order", "协调单号")),
+    ("更改建议单号", ("change_order", "更改建议单号")),
+    ("更改理由", ("change_description", "更改理由")),
+    ("更改建议单涉及图样/文件", ("change_description", "更改建议单涉及图样/文件")),
+    (LABEL_DOC_NO, ("change_order", LABEL_DOC_NO)),
+    ("涉及更改图样", ("change_description", "涉及更改图样")),
+    ("更改类别", ("change_description", "更改类别")),
+    ("更改原因", ("change_description", "更改原因")),
+    ("更改人", ("change_description", "更改人")),
+    ("处理意见", ("change_description", "处理意见")),
+    ("需落实产品编号", ("change_description", "需落实产品编号")),
+    ("已落实情况", ("change_description", "已落实情况")),
+    ("未落实产品编号", ("change_description", "未落实产品编号")),
+    ("工艺更改落实情况", ("change_description", "工艺更改落实情况")),
+    ("备注", ("change_description", "备注")),
+]
+
+# 基线对比导出
+FIELD_LABELS = dict(EXPORT_COLUMNS, lifecycle_state="生命周期状态")
+DIFF_CHANGE_TEXT = {"changed": "变更", "added": "新增", "removed": "移除"}
+DIFF_HEADERS = ["产品代号", "产品名称", "所属型号", "变化", "字段", "基线值", "对比值"]
+
+HEADER_COLOR = "E07A5F"
+MAX_COLUMN_WIDTH = 50
+# write_only 模式下列宽须在写第一行前确定，取前若干行估算
+WIDTH_SAMPLE_ROWS = 500
+# 每写出多少行回调一次进度
+PROGRESS_EVERY = 1000
+
+
+def export_values(item):
+    """按 EXPORT_COLUMNS 顺序取出一行的单元格值"""
+    values = []
+    for field, _ in EXPORT_COLUMNS:
+        value = item.get(field, '')
+        if field == "status":
+            value = STATUS_TEXT.get(value, "正式")
+        # 空值写 None，write_only 模式会直接跳过这类单元格
+        values.append(None if value == "" else value)
+    return values
+
+
+def template_values(product, tech_status):
+    """按 TEMPLATE_COLUMNS 顺序生成单条记录模板行"""
+    values = []
+    for header, source in TEMPLATE_COLUMNS:
+        if isinstance(source, tuple):
+            field, label = source
+            value = extract_labeled_value(tech_status.get(field, ""), label)
+            if not value and header == LABEL_DOC_NO:
+                # 旧数据的更改单号没有标签，原样导出
+                value = tech_status.get("change_order", "")
+        else:
+            value = product.get(source, "")
+        values.append(value or "")
+    return values
+
+
+def write_xlsx(file_path, headers, rows, title="技术状态数据", styled=True, progress=None):
+    """
+    流式写出 xlsx（write_only 工作簿，单次遍历 rows）
+
+    rows: 单元格值列表的可迭代对象，可以是数据库游标生成器；
+    仅缓存前 WIDTH_SAMPLE_ROWS 行用于估算列宽，其余行直接写出。
+    progress: 可选回调，以已写出行数调用；回调抛出异常时中止导出且不留下文件
+    返回写出的数据行数
+    """
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet(title)
+
+    widths = [len(str(header)) for header in headers]
+    sample = []
+    rows = iter(rows)
+    for row in rows:
+        sample.append(row)
+        for idx, value in enumerate(row):
+            if value is not None:
+                widths[idx] = max(widths[idx], len(str(value)))
+        if len(sample) >= WIDTH_SAMPLE_ROWS:
+            break
+    for idx, width in enumerate(widths, 1):
+        ws.column_dimensions[get_column_letter(idx)].width = min(width + 2, MAX_COLUMN_WIDTH)
+
+    if styled:
+        font = Font(bold=True, color="FFFFFF")
+        fill = PatternFill(start_color=HEADER_COLOR, end_color=HEADER_COLOR, fill_type="solid")
+        alignment = Alignment(horizontal="center", vertical="center")
+        header_cells = []
+        for header in headers:
+            cell = WriteOnlyCell(ws, value=header)
+            cell.font = font
+            cell.fill = fill
+            cell.alignment = alignment
+            header_cells.append(cell)
+        ws.append(header_cells)
+    else:
+        ws.append(list(headers))
+
+    count = 0
+    try:
+        for row in itertools.chain(sample, rows):
+            ws.append(row)
+            count += 1
+            if progress and count % PROGRESS_EVERY == 0:
+                progress(count)
+        if progress:
+            progress(count)
+    except BaseException:
+        # 中止时先结束工作表的流式写入，释放其临时文件句柄
+        ws.close()
+        raise
+
+    tmp_path = file_path + ".tmp"
+    try:
+        wb.save(tmp_path)
+        os.replace(tmp_path, file_path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return count
+
+
+def diff_rows(entries):
+    """把 diff_baseline_sets 的差异条目展开为逐字段的导出行"""
+    for entry in entries:
+        head = [entry["product_code"], entry["product_name"], entry["model"],
+                DIFF_CHANGE_TEXT.get(entry["change"], entry["change"])]
+        if not entry["changes"]:
+            yield head + [None, None, None]
+        for change in entry["changes"]:
+            yield head + [FIELD_LABELS.get(change["field"], change["field"]), change["old"], change["new"]]
+
+
 class ExcelExporter:
     """Excel导出工具类"""
-    
+
     @staticmethod
     def export_products(data_list, output_dir="."):
         """
         导出产品数据到Excel
-        
+
         Args:
-            data_list: 产品数据列表，每项包含product和tech_status信息
+            data_list: 产品数据（列表或生成器），每项包含product和tech_status信息
             output_dir: 输出目录
-            
+
         Returns:
             str: 生成的文件路径
         """
-        # 创建工作簿
-        wb = Workbook()
-        ws = wb.active
-        ws.title = "技术状态数据"
-        
-        # 定义表头
-        headers = [
-            "ID", "产品代号", "产品名称", "批次编号", "所属型号",
-            "图号", "图纸版本", "软件版本", "固件版本", "硬件配置",
-            "更改单号", "更改内容", "生效日期", "状态", "创建时间"
-        ]
-        
-        # 写入表头
-        for col_num, header in enumerate(headers, 1):
-            cell = ws.cell(row=1, column=col_num, value=header)
-            cell.font = Font(bold=True, size=11)
-            cell.fill = PatternFill(start_color="1890FF", end_color="1890FF", fill_type="solid")
-            cell.font = Font(bold=True, color="FFFFFF")
-            cell.alignment = Alignment(horizontal="center", vertical="center")
-        
-        # 写入数据
-        for row_num, data in enumerate(data_list, 2):
-            # 产品基本信息
-            ws.cell(row=row_num, column=1, value=data.get('id', ''))
-            ws.cell(row=row_num, column=2, value=data.get('product_code', ''))
-            ws.cell(row=row_num, column=3, value=data.get('product_name', ''))
-            ws.cell(row=row_num, column=4, value=data.get('batch_number', ''))
-            ws.cell(row=row_num, column=5, value=data.get('model', ''))
-            
-            # 技术状态信息
-            ws.cell(row=row_num, column=6, value=data.get('drawing_number', ''))
-            ws.cell(row=row_num, column=7, value=data.get('drawing_version', ''))
-            ws.cell(row=row_num, column=8, value=data.get('software_version', ''))
-            ws.cell(row=row_num, column=9, value=data.get('firmware_version', ''))
-            ws.cell(row=row_num, column=10, value=data.get('hardware_config', ''))
-            ws.cell(row=row_num, column=11, value=data.get('change_order', ''))
-            ws.cell(row=row_num, column=12, value=data.get('change_description', ''))
-            ws.cell(row=row_num, column=13, value=data.get('effective_date', ''))
-            
-            # 状态和时间
-            status_text = "草稿" if data.get('status') == 'draft' else "正式" if data.get('status') == 'active' else "已删除"
-            ws.cell(row=row_num, column=14, value=status_text)
-            ws.cell(row=row_num, column=15, value=data.get('created_at', ''))
-        
-        # 自动调整列宽
-        for column in ws.columns:
-            max_length = 0
-            column_letter = column[0].column_letter
-            for cell in column:
-                try:
-                    if len(str(cell.value)) > max_length:
-                        max_length = len(str(cell.value))
-                except:
-                    pass
-            adjusted_width = min(max_length + 2, 50)  # 最大宽度50
-            ws.column_dimensions[column_letter].width = adjusted_width
-        
-        # 生成文件名
         timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
         filename = f"技术状态数据_{timestamp}.xlsx"
         filepath = os.path.join(output_dir, filename)
-        
-        # 保存文件
-        wb.save(filepath)
+        ExcelExporter.export_to_file(data_list, filepath)
         return filepath
+
+    @staticmethod
+    def export_to_file(data_list, file_path, progress=None):
+        """导出产品数据到指定文件，返回导出行数"""
+        headers = [header for _, header in EXPORT_COLUMNS]
+        return write_xlsx(
+            file_path, headers, (export_values(item) for item in data_list), progress=progress
+        )
+
+    @staticmethod
+    def export_query(db, file_path, progress=None, **filters):
+        """按 get_products_with_tech_status 的筛选条件直接从数据库流式导出"""
+        return ExcelExporter.export_to_file(
+            db.iter_products_with_tech_status(**filters), file_path, progress=progress
+        )
+
+    @staticmethod
+    def export_template_record(product, tech_status, file_path):
+        """导出单条记录为导入模板格式"""
+        headers = [header for header, _ in TEMPLATE_COLUMNS]
+        return write_xlsx(file_path, headers, [template_values(product, tech_status)],
+                          title="Sheet", styled=False)
+
+    @staticmethod
+    def export_baseline_diff(entries, file_path):
+        """导出基线对比结果（每个变化字段一行），返回导出行数"""
+        return write_xlsx(file_path, DIFF_HEADERS, diff_rows(entries), title="基线对比")
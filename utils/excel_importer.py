@@ -1,7 +1,9 @@
 # -*- coding: utf-8 -*-
 import re
+from collections import Counter
 from datetime import datetime, date
 from difflib import SequenceMatcher
+from functools import lru_cache
 
 from openpyxl import load_workbook
 
@@ -19,6 +21,10 @@ def _similarity(a, b):
     return SequenceMatcher(None, a, b).ratio()
 
 
+# 模糊匹配阈值
+FUZZY_THRESHOLD = 0.72
+
+
 def _clean_value(value):
     if value is None:
         return ""
@@ -108,12 +114,41 @@ class ExcelImporter:
             key: [_normalize(item) for item in items]
             for key, items in self._synonyms.items()
         }
+        self._build_match_index()
+        # 同一表头在各工作表、各候选行中反复出现，按规范化表头缓存匹配结果
+        self._match_cached = lru_cache(maxsize=4096)(self._match_uncached)
+
+    def _build_match_index(self):
+        """
+        预编译表头匹配索引
+
+        _synonym_entries 按字段、同义词原有顺序展开，保证命中优先级不变；
+        _exact_index 记录每个同义词最先出现的位置；
+        _char_index 为字符 -> 同义词位置，用于模糊匹配前的候选预筛。
+        """
+        self._synonym_entries = []
+        self._exact_index = {}
+        self._char_index = {}
+        for field, synonyms in self._synonyms_norm.items():
+            for syn in synonyms:
+                pos = len(self._synonym_entries)
+                self._synonym_entries.append((field, syn, Counter(syn)))
+                if not syn:
+                    continue
+                self._exact_index.setdefault(syn, pos)
+                for char in set(syn):
+                    self._char_index.setdefault(char, []).append(pos)
 
     def guess_header_row(self, ws, max_scan=8):
+        rows = ws.iter_rows(min_row=1, max_row=max_scan, values_only=True)
+        return self._guess_header_index(rows)
+
+    def _guess_header_index(self, rows):
+        """rows 为工作表前若干行的值，返回匹配字段最多的行号（从 1 开始）"""
         best_row = 1
         best_score = -1
-        for row_idx in range(1, min(ws.max_row, max_scan) + 1):
-            values = [_normalize(cell.value) for cell in ws[row_idx]]
+        for row_idx, row in enumerate(rows, start=1):
+            values = [_normalize(value) for value in row]
             score = 0
             for val in values:
                 if self.match_field(val):
@@ -126,34 +161,52 @@ class ExcelImporter:
     def match_field(self, header_value):
         if not header_value:
             return None
+        return self._match_cached(header_value)
+
+    def _match_uncached(self, header_value):
         # 特殊规则：生产批次优先
         if "生产" in header_value and "批次" in header_value:
             return "production_batch"
         if "落实" in header_value and "产品编号" in header_value:
             return "change_description"
-        for field, synonyms in self._synonyms_norm.items():
-            for syn in synonyms:
-                if not syn:
-                    continue
-                if header_value == syn or syn in header_value or header_value in syn:
-                    return field
-        # 模糊匹配
+
+        # 精确/包含匹配：取顺序最靠前的命中；精确命中位置之后的同义词无需再比较
+        end = self._exact_index.get(header_value, len(self._synonym_entries))
+        for field, syn, _ in self._synonym_entries[:end]:
+            if syn and (syn in header_value or header_value in syn):
+                return field
+        if end < len(self._synonym_entries):
+            return self._synonym_entries[end][0]
+
+        # 模糊匹配：相似度上限为 2 * 公共字符数 / 总长度，
+        # 上限达不到阈值的同义词不可能命中，跳过 SequenceMatcher
+        header_chars = Counter(header_value)
+        candidates = set()
+        for char in header_chars:
+            candidates.update(self._char_index.get(char, ()))
         best_field = None
         best_score = 0.0
-        for field, synonyms in self._synonyms_norm.items():
-            for syn in synonyms:
-                score = _similarity(header_value, syn)
-                if score > best_score:
-                    best_score = score
-                    best_field = field
-        if best_score >= 0.72:
+        for pos in sorted(candidates):
+            field, syn, syn_chars = self._synonym_entries[pos]
+            total = len(header_value) + len(syn)
+            if 2.0 * sum((header_chars & syn_chars).values()) / total < FUZZY_THRESHOLD:
+                continue
+            score = _similarity(header_value, syn)
+            if score > best_score:
+                best_score = score
+                best_field = field
+        if best_score >= FUZZY_THRESHOLD:
             return best_field
         return None
 
     def build_mapping(self, ws, header_row):
+        row = next(ws.iter_rows(min_row=header_row, max_row=header_row, values_only=True), ())
+        return self._mapping_from_values(row)
+
+    def _mapping_from_values(self, header_values):
         mapping = {}
-        for idx, cell in enumerate(ws[header_row], start=1):
-            header_raw = "" if cell.value is None else str(cell.value).strip()
+        for idx, value in enumerate(header_values, start=1):
+            header_raw = "" if value is None else str(value).strip()
             header = _normalize(header_raw)
             if not header:
                 continue
@@ -166,35 +219,61 @@ class ExcelImporter:
                 mapping[field] = idx
         return mapping
 
-    def parse(self, file_path, sheet_name=None):
-        wb = load_workbook(file_path, data_only=True)
-        ws = wb[sheet_name] if sheet_name else wb.active
-        header_row = self.guess_header_row(ws)
-        mapping = self.build_mapping(ws, header_row)
-
-        rows = []
-        for row in ws.iter_rows(min_row=header_row + 1, values_only=True):
-            if all(cell is None or str(cell).strip() == "" for cell in row):
-                continue
-            record = {}
-            for field, col_info in mapping.items():
-                if isinstance(col_info, list):
-                    combined = []
-                    for header_raw, col_idx in col_info:
-                        value = row[col_idx - 1] if col_idx - 1 < len(row) else None
-                        value = _clean_value(value)
-                        if value:
-                            if field in self._label_fields and header_raw:
-                                combined.append(f"{header_raw}:{value}")
-                            else:
-                                combined.append(value)
-                    record[field] = "; ".join(combined)
-                else:
-                    value = row[col_info - 1] if col_info - 1 < len(row) else None
-                    record[field] = _clean_value(value)
-            rows.append(record)
+    def _build_record(self, row, mapping):
+        record = {}
+        for field, col_info in mapping.items():
+            if isinstance(col_info, list):
+                combined = []
+                for header_raw, col_idx in col_info:
+                    value = row[col_idx - 1] if col_idx - 1 < len(row) else None
+                    value = _clean_value(value)
+                    if value:
+                        if field in self._label_fields and header_raw:
+                            combined.append(f"{header_raw}:{value}")
+                        else:
+                            combined.append(value)
+                record[field] = "; ".join(combined)
+            else:
+                value = row[col_info - 1] if col_info - 1 < len(row) else None
+                record[field] = _clean_value(value)
+        return record
+
+    def _iter_records(self, wb, ws, header_row, mapping):
+        try:
+            for row in ws.iter_rows(min_row=header_row + 1, values_only=True):
+                if all(cell is None or str(cell).strip() == "" for cell in row):
+                    continue
+                yield self._build_record(row, mapping)
+        finally:
+            wb.close()
+
+    def stream(self, file_path, sheet_name=None, max_scan=8):
+        """
+        流式解析 Excel（只读模式，逐行读取）
+
+        只读取前 max_scan 行识别表头，数据行由生成器逐条产出，
+        内存占用与工作表大小无关。返回结构同 parse，但 rows 为生成器，
+        只能遍历一次；遍历结束后自动关闭工作簿。
+        """
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            ws = wb[sheet_name] if sheet_name else wb.active
+            # 部分工具写出的 dimension 信息不准确，只读模式下会导致行被截断
+            ws.reset_dimensions()
+            head = list(ws.iter_rows(min_row=1, max_row=max_scan, values_only=True))
+            header_row = self._guess_header_index(head)
+            header_values = head[header_row - 1] if head else ()
+            mapping = self._mapping_from_values(header_values)
+        except Exception:
+            wb.close()
+            raise
         return {
             "header_row": header_row,
             "mapping": mapping,
-            "rows": rows,
+            "rows": self._iter_records(wb, ws, header_row, mapping),
         }
+
+    def parse(self, file_path, sheet_name=None):
+        parsed = self.stream(file_path, sheet_name)
+        parsed["rows"] = list(parsed["rows"])
+        return parsed
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+from openpyxl import load_workbook
+
+from utils.excel_importer import ExcelImporter
+
+# 导入结果中逐表累计的计数项
+COUNT_KEYS = ("created_products", "updated_products", "inserted_status", "unchanged_rows", "skipped_rows")
+
+# 默认解析进程数上限：每个进程返回整张工作表，进程数同时决定当前进程暂存的工作表数
+DEFAULT_MAX_WORKERS = 4
+
+# 每个解析进程复用一个 ExcelImporter（表头匹配缓存随进程保留）
+_worker_importer = None
+
+
+class ImportCancelled(Exception):
+    """导入任务被用户取消"""
+
+
+def list_sheets(file_path):
+    """列出工作簿中的全部工作表名称（只读模式，不加载单元格）"""
+    wb = load_workbook(file_path, read_only=True)
+    try:
+        return list(wb.sheetnames)
+    finally:
+        wb.close()
+
+
+def parse_sheet(file_path, sheet_name, materialize=True):
+    """
+    解析单个工作表
+
+    返回 dict: file, sheet, header_row, rows, error
+    materialize 为 True 时 rows 为列表（供解析进程返回，需可 pickle），
+    否则为逐行读取的生成器（当前进程内流式导入）。
+    未识别到产品代号列的工作表视为非数据表，rows 为空并给出 error
+    """
+    global _worker_importer
+    if _worker_importer is None:
+        _worker_importer = ExcelImporter()
+    result = {"file": file_path, "sheet": sheet_name, "header_row": None, "rows": [], "error": None}
+    try:
+        parsed = _worker_importer.stream(file_path, sheet_name)
+        result["header_row"] = parsed["header_row"]
+        if "product_code" not in parsed["mapping"]:
+            parsed["rows"].close()
+            result["error"] = "未识别到产品代号列，已跳过"
+            return result
+        result["rows"] = list(parsed["rows"]) if materialize else parsed["rows"]
+    except Exception as exc:
+        result["error"] = f"解析失败: {exc}"
+    return result
+
+
+class ImportJob:
+    """
+    多文件、多工作表导入任务
+
+    各工作表在进程池中并行解析，解析结果按文件、工作表顺序交给当前线程
+    逐个写入数据库（单写者），每个工作表一个事务。
+    """
+
+    def __init__(self, db, files, operator="系统", max_workers=None):
+        self.db = db
+        self.files = list(files)
+        self.operator = operator
+        self.max_workers = max_workers or min(os.cpu_count() or 1, DEFAULT_MAX_WORKERS)
+        self.progress = {
+            "sheets_total": 0,
+            "sheets_done": 0,
+            "rows_parsed": 0,
+            "rows_written": 0,
+        }
+
+    def _collect_tasks(self, summary):
+        tasks = []
+        for file_path in self.files:
+            try:
+                sheets = list_sheets(file_path)
+            except Exception as exc:
+                summary["sheets"].append(self._sheet_entry(file_path, None, error=f"无法打开: {exc}"))
+                continue
+            tasks.extend((file_path, sheet) for sheet in sheets)
+        return tasks
+
+    def _sheet_entry(self, file_path, sheet_name, error=None):
+        entry = {"file": file_path, "sheet": sheet_name, "rows": 0, "errors": [], "error": error}
+        entry.update(dict.fromkeys(COUNT_KEYS, 0))
+        return entry
+
+    def _iter_parsed(self, tasks, is_cancelled):
+        """
+        按任务顺序产出解析结果
+
+        解析进程返回整张工作表的行列表，进程池中最多同时保留与进程数相同的任务，
+        当前进程因此最多暂存这么多张工作表（以少量并行度换取内存上限）
+        """
+        if len(tasks) <= 1 or self.max_workers <= 1:
+            # 单个工作表不值得启动进程池，直接在当前线程流式读取
+            for task in tasks:
+                if is_cancelled():
+                    raise ImportCancelled()
+                yield parse_sheet(*task, materialize=False)
+            return
+
+        window = self.max_workers
+        with ProcessPoolExecutor(max_workers=min(self.max_workers, len(tasks))) as pool:
+            pending = []
+            next_task = 0
+            try:
+                while next_task < len(tasks) or pending:
+                    while next_task < len(tasks) and len(pending) < window:
+                        pending.append(pool.submit(parse_sheet, *tasks[next_task]))
+                        next_task += 1
+                    future = pending.pop(0)
+                    yield future.result()
+                    if is_cancelled():
+                        raise ImportCancelled()
+            finally:
+                for future in pending:
+                    future.cancel()
+
+    def run(self, on_progress=None, is_cancelled=None):
+        """
+        执行导入
+
+        on_progress: 可选回调，进度变化时以 self.progress 调用
+        is_cancelled: 可选回调，返回 True 时回滚当前工作表并停止
+        返回 dict: 各项合计、sheets（逐表明细）、cancelled
+        """
+        is_cancelled = is_cancelled or (lambda: False)
+        notify = on_progress or (lambda progress: None)
+        summary = dict.fromkeys(COUNT_KEYS, 0)
+        summary.update({"sheets": [], "cancelled": False})
+        tasks = self._collect_tasks(summary)
+        self.progress["sheets_total"] = len(tasks)
+        notify(self.progress)
+
+        def on_batch(rows_done):
+            if streamed:
+                self.progress["rows_parsed"] = parsed_before + rows_done
+            self.progress["rows_written"] = written_before + rows_done
+            notify(self.progress)
+            if is_cancelled():
+                raise ImportCancelled()
+
+        parsed_sheets = self._iter_parsed(tasks, is_cancelled)
+        try:
+            for parsed in parsed_sheets:
+                entry = self._sheet_entry(parsed["file"], parsed["sheet"], parsed["error"])
+                rows = parsed["rows"]
+                streamed = not isinstance(rows, list)
+                parsed_before = self.progress["rows_parsed"]
+                written_before = self.progress["rows_written"]
+                if not streamed:
+                    self.progress["rows_parsed"] += len(rows)
+                    notify(self.progress)
+                if streamed or rows:
+                    result = self.db.bulk_upsert_products(
+                        rows, operator=self.operator, progress=on_batch
+                    )
+                    for key in COUNT_KEYS:
+                        entry[key] = result[key]
+                        summary[key] += result[key]
+                    entry["rows"] = (
+                        result["inserted_status"] + result["unchanged_rows"] + result["skipped_rows"]
+                    )
+                    entry["errors"] = result["errors"]
+                summary["sheets"].append(entry)
+                self.progress["sheets_done"] += 1
+                notify(self.progress)
+        except ImportCancelled:
+            summary["cancelled"] = True
+        finally:
+            parsed_sheets.close()
+        return summary
+
+
+def format_import_summary(summary, max_errors=5):
+    """生成导入结果提示文本"""
+    lines = [
+        "导入已取消，当前工作表已回滚" if summary["cancelled"] else "导入完成",
+        f"新增产品: {summary['created_products']}",
+        f"更新产品: {summary['updated_products']}",
+        f"新增技术状态: {summary['inserted_status']}",
+        f"未变化行数: {summary['unchanged_rows']}",
+        f"跳过行数: {summary['skipped_rows']}",
+    ]
+    details = []
+    for entry in summary["sheets"]:
+        name = os.path.basename(entry["file"])
+        if entry["sheet"]:
+            name = f"{name} / {entry['sheet']}"
+        if entry["error"]:
+            details.append(f"{name}: {entry['error']}")
+        elif entry["errors"]:
+            details.append(f"{name}: {len(entry['errors'])} 行有误，如 {entry['errors'][0]}")
+    if details:
+        lines.append("")
+        lines.append("工作表提示:")
+        lines.extend(details[:max_errors])
+        if len(details) > max_errors:
+            lines.append(f"……另有 {len(details) - max_errors} 个工作表")
+    return "\n".join(lines)
@@ -0,0 +1,84 @@
+# -*- coding: utf-8 -*-
+import os
+
+from db.database import export_columns
+
+# pyarrow 为可选依赖，未安装时列式导出不可用
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# 整数列，其余列均按字符串导出
+INTEGER_COLUMNS = {"id", "tech_status_id"}
+
+# 每个 row group / record batch 的行数
+BATCH_SIZE = 50000
+
+
+class ParquetExporter:
+    """
+    列式导出工具类（Parquet 或 Arrow IPC，需要 pyarrow）
+
+    文件扩展名为 .arrow / .feather 时写 Arrow IPC 文件，否则写 Parquet。
+    """
+
+    @staticmethod
+    def is_available():
+        return pa is not None
+
+    @staticmethod
+    def export_query(db, file_path, history=False, progress=None, **filters):
+        """
+        按 get_products_with_tech_status 的筛选条件流式导出
+
+        history 为 True 时导出全部历史技术状态；progress 回调以已导出行数调用。
+        返回导出行数
+        """
+        if pa is None:
+            raise RuntimeError("未安装 pyarrow，无法导出 Parquet/Arrow 文件")
+
+        columns = export_columns(history)
+        schema = pa.schema([
+            (name, pa.int64() if name in INTEGER_COLUMNS else pa.string()) for name in columns
+        ])
+        arrow_ipc = os.path.splitext(file_path)[1].lower() in (".arrow", ".feather")
+        tmp_path = file_path + ".tmp"
+        count = 0
+        try:
+            if arrow_ipc:
+                writer = pa.ipc.new_file(tmp_path, schema)
+            else:
+                writer = pq.ParquetWriter(tmp_path, schema, compression="zstd")
+            try:
+                for rows in db.iter_export_batches(history=history, batch_size=BATCH_SIZE, **filters):
+                    batch = pa.record_batch(_to_arrays(rows, columns), schema=schema)
+                    if arrow_ipc:
+                        writer.write_batch(batch)
+                    else:
+                        writer.write_table(pa.Table.from_batches([batch]))
+                    count += len(rows)
+                    if progress:
+                        progress(count)
+            finally:
+                writer.close()
+            os.replace(tmp_path, file_path)
+        finally:
+            if os.path.exists(tmp_path):
+                os.remove(tmp_path)
+        return count
+
+
+def _to_arrays(rows, columns):
+    arrays = []
+    for idx, name in enumerate(columns):
+        values = [row[idx] for row in rows]
+        if name in INTEGER_COLUMNS:
+            arrays.append(pa.array(values, type=pa.int64()))
+        else:
+            arrays.append(pa.array(
+                [None if value is None else str(value) for value in values], type=pa.string()
+            ))
+    return arrays